@@ -0,0 +1,34 @@
+import copy
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram.cache import Generations, get_cache
+
+token_cache = get_cache('auth_token', settings.TOKEN_CACHE)
+token_generations = Generations('auth_token')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кэшем токен → (пользователь, токен).
+
+    Повторные запросы с тем же токеном обходятся без запроса к БД.
+    Запись действительна, пока не сменилось общее для воркеров
+    поколение токена: его меняют сигналы при удалении токена
+    (выход), сохранении и удалении пользователя. Изменения в обход
+    сигналов (QuerySet.update) видны через TOKEN_CACHE['TIMEOUT'].
+    Возвращаются копии, чтобы изменения request.user не попадали
+    в кэш и в другие запросы.
+    """
+
+    def authenticate_credentials(self, key):
+        # Поколение читается до БД, чтобы сброс во время запроса
+        # не оставил в кэше прочитанные до него данные.
+        generation = token_generations.get(key)
+        cached = token_cache.get(key)
+        if cached is None or cached[2] != generation:
+            cached = (*super().authenticate_credentials(key), generation)
+            token_cache.set(key, cached)
+        user, token = map(copy.copy, cached[:2])
+        token.user = user
+        return user, token
@@ -0,0 +1,90 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from foodgram.cache import Generations
+from recipes.models import Ingredients
+
+PREFIX, WORD_PREFIX, INFIX = range(3)
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Загружается из БД при первом обращении и после сброса, который
+    через общее поколение виден всем процессам.
+    Совпадения по началу названия идут раньше совпадений
+    по началу слова, а те раньше совпадений внутри слова.
+    """
+
+    def __init__(self, timeout=None, limit=None):
+        self.timeout = timeout
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._generations = Generations('ingredient_index')
+        # (поколение, время загрузки, записи, ключи) публикуются
+        # одним присваиванием, чтобы поиск не смешал две версии.
+        self._index = None
+
+    def invalidate(self):
+        """Сбрасывает индекс во всех процессах."""
+        self._generations.bump()
+
+    def _is_fresh(self, index, generation):
+        return index is not None and index[0] == generation and (
+            self.timeout is None
+            or time.monotonic() - index[1] <= self.timeout)
+
+    def _get_index(self):
+        generation = self._generations.get()
+        index = self._index
+        if self._is_fresh(index, generation):
+            return index
+        with self._lock:
+            index = self._index
+            if not self._is_fresh(index, generation):
+                ingredients = Ingredients.objects.order_by().values(
+                    'id', 'name', 'measurement_unit')
+                entries = sorted(
+                    (ingredient['name'].casefold(), ingredient)
+                    for ingredient in ingredients.iterator()
+                )
+                keys = [key for key, _ in entries]
+                index = generation, time.monotonic(), entries, keys
+                self._index = index
+            return index
+
+    def search(self, query=''):
+        """Возвращает ингредиенты, подходящие под запрос, по релевантности."""
+        _, _, entries, keys = self._get_index()
+        query = query.strip().casefold()
+        if not query:
+            return [ingredient for _, ingredient in entries]
+        limit = self.limit or len(entries)
+        results = []
+        position = bisect_left(keys, query)
+        while (position < len(entries) and len(results) < limit
+               and entries[position][0].startswith(query)):
+            results.append(entries[position][1])
+            position += 1
+        if len(results) == limit:
+            return results
+        ranked = []
+        for key, ingredient in entries:
+            found = key.find(query)
+            if found <= 0:
+                continue
+            rank = WORD_PREFIX if not key[found - 1].isalnum() else INFIX
+            ranked.append((rank, found, key, ingredient))
+        ranked.sort(key=lambda item: item[:3])
+        results.extend(
+            ingredient for *_, ingredient in ranked[:limit - len(results)])
+        return results
+
+
+ingredient_index = IngredientIndex(
+    settings.INGREDIENT_INDEX['TIMEOUT'],
+    settings.INGREDIENT_INDEX['LIMIT'],
+)
@@ -0,0 +1,296 @@
+import json
+import os
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredients, Recipes, Tag
+from users.models import User, UserSubscribers
+
+BUDGETS_PATH = os.path.join(
+    os.path.dirname(__file__), 'benchmark_budgets.json')
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+       'AAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+Endpoint = namedtuple(
+    'Endpoint',
+    ('name', 'method', 'path', 'user', 'query', 'data', 'scale',
+     'setup', 'cleanup'),
+    defaults=('reader', None, None, None, None, None),
+)
+RECIPE = {'name': 'Бенчмарк', 'text': 'Текст', 'cooking_time': 10,
+          'image': PNG, 'tags': ['{tag}'],
+          'ingredients': [{'id': '{ingredient}', 'amount': 10}]}
+
+Result = namedtuple(
+    'Result', ('name', 'status', 'queries', 'p50', 'p95', 'size', 'errors'))
+
+ENDPOINTS = (
+    Endpoint('users-list', 'get', '/api/users/', 'anon',
+             scale={'limit': (6, 30)}),
+    Endpoint('users-list-auth', 'get', '/api/users/',
+             scale={'limit': (6, 30)}),
+    Endpoint('users-detail', 'get', '/api/users/{author}/'),
+    Endpoint('users-me', 'get', '/api/users/me/'),
+    Endpoint('users-create', 'post', '/api/users/', 'anon',
+             data={'email': 'bench{n}@example.com', 'username': 'bench{n}',
+                   'first_name': 'a', 'last_name': 'b',
+                   'password': 'Bench-Passw0rd'}),
+    Endpoint('users-set-password', 'post', '/api/users/set_password/',
+             data={'current_password': 'Bench-Passw0rd',
+                   'new_password': 'Bench-Passw0rd'}),
+    Endpoint('users-avatar-put', 'put', '/api/users/me/avatar/',
+             data={'avatar': PNG},
+             cleanup=('delete', '/api/users/me/avatar/', None)),
+    Endpoint('users-avatar-delete', 'delete', '/api/users/me/avatar/',
+             setup=('put', '/api/users/me/avatar/', {'avatar': PNG})),
+    Endpoint('users-subscriptions', 'get', '/api/users/subscriptions/',
+             scale={'limit': (6, 30), 'recipes_limit': (1, 10)}),
+    Endpoint('users-subscribe', 'post', '/api/users/{stranger}/subscribe/',
+             cleanup=('delete', '/api/users/{stranger}/subscribe/', None)),
+    Endpoint('users-unsubscribe', 'delete',
+             '/api/users/{stranger}/subscribe/',
+             setup=('post', '/api/users/{stranger}/subscribe/', None)),
+    Endpoint('users-subscribe-bulk', 'post', '/api/users/subscribe/',
+             data={'ids': '{strangers}'},
+             cleanup=('delete', '/api/users/subscribe/',
+                      {'ids': '{strangers}'})),
+    Endpoint('auth-token-login', 'post', '/api/auth/token/login/', 'anon',
+             data={'email': '{email}', 'password': 'Bench-Passw0rd'}),
+    Endpoint('auth-token-logout', 'post', '/api/auth/token/logout/',
+             'prepared',
+             setup=('post', '/api/auth/token/login/',
+                    {'email': '{stranger_email}',
+                     'password': 'Bench-Passw0rd'})),
+    Endpoint('tags-list', 'get', '/api/tags/', 'anon'),
+    Endpoint('tags-detail', 'get', '/api/tags/{tag}/', 'anon'),
+    Endpoint('ingredients-list', 'get', '/api/ingredients/', 'anon'),
+    Endpoint('ingredients-search', 'get', '/api/ingredients/', 'anon',
+             query={'name': 'ка'}),
+    Endpoint('ingredients-detail', 'get', '/api/ingredients/{ingredient}/',
+             'anon'),
+    Endpoint('recipes-list-anon', 'get', '/api/recipes/', 'anon',
+             scale={'limit': (6, 30)}),
+    Endpoint('recipes-list', 'get', '/api/recipes/',
+             scale={'limit': (6, 30)}),
+    Endpoint('recipes-list-cursor', 'get', '/api/recipes/',
+             query={'cursor': ''}, scale={'limit': (6, 30)}),
+    Endpoint('recipes-list-filtered', 'get', '/api/recipes/',
+             query={'is_favorited': 1, 'tags': '{tag_slug}'},
+             scale={'limit': (6, 30)}),
+    Endpoint('recipes-detail', 'get', '/api/recipes/{recipe}/'),
+    Endpoint('recipes-feed', 'get', '/api/recipes/feed/',
+             scale={'limit': (6, 30)}),
+    Endpoint('recipes-get-link', 'get', '/api/recipes/{recipe}/get-link/'),
+    Endpoint('recipes-create', 'post', '/api/recipes/',
+             data=dict(RECIPE, ingredients='{ingredient_amounts}'),
+             scale={'ingredient_amounts': (1, 10)}),
+    Endpoint('recipes-update', 'patch', '/api/recipes/{own_recipe}/',
+             data={'name': 'Бенчмарк {n}'}),
+    Endpoint('recipes-update-ingredients', 'patch',
+             '/api/recipes/{own_recipe}/',
+             data={'ingredients': '{ingredient_amounts}'},
+             scale={'ingredient_amounts': (1, 10)},
+             setup=('patch', '/api/recipes/{own_recipe}/',
+                    {'ingredients': [{'id': '{ingredient}', 'amount': 1}]})),
+    Endpoint('recipes-delete', 'delete', '/api/recipes/{prepared[id]}/',
+             setup=('post', '/api/recipes/', RECIPE)),
+    Endpoint('recipes-favorite', 'post', '/api/recipes/{recipe}/favorite/',
+             cleanup=('delete', '/api/recipes/{recipe}/favorite/', None)),
+    Endpoint('recipes-unfavorite', 'delete',
+             '/api/recipes/{recipe}/favorite/',
+             setup=('post', '/api/recipes/{recipe}/favorite/', None)),
+    Endpoint('recipes-shopping-cart', 'post',
+             '/api/recipes/{recipe}/shopping_cart/',
+             cleanup=('delete', '/api/recipes/{recipe}/shopping_cart/',
+                      None)),
+    Endpoint('recipes-favorite-bulk', 'post', '/api/recipes/favorite/',
+             data={'ids': '{recipes}'},
+             cleanup=('delete', '/api/recipes/favorite/',
+                      {'ids': '{recipes}'})),
+    Endpoint('recipes-shopping-cart-bulk', 'post',
+             '/api/recipes/shopping_cart/', data={'ids': '{recipes}'},
+             cleanup=('delete', '/api/recipes/shopping_cart/',
+                      {'ids': '{recipes}'})),
+    Endpoint('recipes-download-txt', 'get',
+             '/api/recipes/download_shopping_cart/', query={'format': 'txt'}),
+    Endpoint('recipes-download-csv', 'get',
+             '/api/recipes/download_shopping_cart/', query={'format': 'csv'}),
+    Endpoint('recipes-download-pdf', 'get',
+             '/api/recipes/download_shopping_cart/', query={'format': 'pdf'}),
+    Endpoint('short-link', 'get', '/s/{short_link}/', 'anon'),
+)
+
+
+def fill(value, context):
+    """Подставляет значения контекста в шаблоны запроса."""
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, context) for item in value]
+    if isinstance(value, str) and value.startswith('{') and value.endswith(
+            '}') and value[1:-1] in context:
+        return context[value[1:-1]]
+    if isinstance(value, str):
+        return value.format(**context)
+    return value
+
+
+def build_context(reader):
+    """Объекты набора данных, на которых выполняются запросы."""
+    followed = UserSubscribers.objects.filter(user=reader).values('subscriber')
+    strangers = list(User.objects.exclude(pk=reader.pk).exclude(
+        pk__in=followed).order_by('pk').values_list('pk', flat=True)[:5])
+    recipes = list(Recipes.objects.exclude(author=reader).exclude(
+        favorite__user=reader).exclude(shopping_cart__user=reader).order_by(
+        'pk').values_list('pk', flat=True)[:5])
+    recipe = Recipes.objects.get(pk=recipes[0])
+    tag = Tag.objects.order_by('pk').first()
+    ingredients = Ingredients.objects.order_by('pk').values_list(
+        'pk', flat=True)[:10]
+    return {
+        'email': reader.email,
+        'author': followed.first()['subscriber'],
+        'stranger': strangers[0],
+        'stranger_email': User.objects.get(pk=strangers[0]).email,
+        'strangers': strangers,
+        'recipe': recipe.pk,
+        'recipes': recipes[1:],
+        'own_recipe': Recipes.objects.filter(author=reader).first().pk,
+        'short_link': recipe.short_link,
+        'tag': tag.pk,
+        'tag_slug': tag.slug,
+        'ingredient': recipe.ingredients.order_by('pk').first().pk,
+        'ingredient_amounts': [
+            {'id': pk, 'amount': 10} for pk in ingredients],
+    }
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Benchmark:
+    """Прогоняет запросы к API в процессе и собирает замеры."""
+
+    def __init__(self, reader, password, repeat=10):
+        self.repeat = repeat
+        self.reader = reader
+        self.context = build_context(reader)
+        for user in User.objects.filter(
+                pk__in=(reader.pk, self.context['stranger'])):
+            user.set_password(password)
+            user.save()
+        self.clients = {'anon': APIClient(), 'reader': APIClient()}
+        self.clients['reader'].credentials(
+            HTTP_AUTHORIZATION='Token '
+            + Token.objects.get_or_create(user=reader)[0].key)
+        self.counter = 0
+
+    def client(self, user):
+        """Клиент пользователя; 'prepared' — с токеном из подготовки."""
+        if user != 'prepared':
+            return self.clients[user]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token '
+                           + self.context['prepared']['auth_token'])
+        return client
+
+    def request(self, client, method, path, query=None, data=None):
+        self.counter += 1
+        context = dict(self.context, n=self.counter)
+        query = dict(query or {})
+        # Масштаб списка из контекста — его длина, а не параметр запроса.
+        for key in [key for key in query if isinstance(
+                context.get(key), list)]:
+            context[key] = context[key][:query.pop(key)]
+        path = fill(path, context)
+        if query:
+            path = f'{path}?{urlencode(fill(query, context))}'
+        return getattr(client, method)(
+            path, data=fill(data, context), format='json')
+
+    def prepare(self, step):
+        """Подготовка или уборка: (метод, путь, тело), статус проверяется.
+
+        Ответ подготовки доступен запросу как {prepared}.
+        """
+        method, path, data = step
+        response = self.request(self.clients['reader'], method, path,
+                                data=data)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{method.upper()} {path}: {response.status_code}')
+        self.context['prepared'] = getattr(response, 'data', None)
+
+    def measure(self, endpoint, query):
+        """Прогрев, затем repeat замеров одного варианта запроса."""
+        queries, timings, sizes, statuses = [], [], [], set()
+        for number in range(self.repeat + 1):
+            if endpoint.setup:
+                self.prepare(endpoint.setup)
+            client = self.client(endpoint.user)
+            # Журнал запросов ограничен 9000 записями, срезы по нему
+            # перестают работать после переполнения.
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(
+                    client, endpoint.method, endpoint.path, query,
+                    endpoint.data)
+                content = b''.join(response) if response.streaming else (
+                    response.content)
+                elapsed = time.perf_counter() - started
+            # Читаем до cleanup: request_started очищает журнал запросов.
+            count = len(captured)
+            if endpoint.cleanup:
+                self.prepare(endpoint.cleanup)
+            if number == 0:
+                continue
+            queries.append(count)
+            timings.append(elapsed * 1000)
+            sizes.append(len(content))
+            statuses.add(response.status_code)
+        return max(queries), timings, max(sizes), statuses
+
+    def run(self, endpoint, budget=None):
+        query = dict(endpoint.query or {})
+        scale = endpoint.scale or {}
+        base = dict(query, **{key: sizes[0] for key, sizes in scale.items()})
+        queries, timings, size, statuses = self.measure(endpoint, base)
+        errors = []
+        for key, (small, large) in scale.items():
+            grown = self.measure(endpoint, dict(base, **{key: large}))[0]
+            if grown != queries:
+                errors.append(
+                    f'запросов при {key}={small}: {queries}, '
+                    f'при {key}={large}: {grown}')
+        if budget is not None and queries > budget:
+            errors.append(f'запросов {queries} при бюджете {budget}')
+        if any(status >= 400 for status in statuses):
+            errors.append(f'статус ответа {sorted(statuses)}')
+        return Result(
+            endpoint.name, ','.join(map(str, sorted(statuses))), queries,
+            percentile(timings, 0.5), percentile(timings, 0.95), size, errors)
+
+
+def load_budgets(path=BUDGETS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_budgets(results, path=BUDGETS_PATH, kept=None):
+    """Записывает бюджеты по замерам; kept — бюджеты пропущенных."""
+    budgets = dict(kept or {})
+    budgets.update((result.name, result.queries) for result in results)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(budgets, file, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from recipes.search import is_postgresql
+from .serializers import BulkIdsSerializer
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+def returning(sql, model, field, user, ids):
+    """INSERT или DELETE связей с RETURNING, только для PostgreSQL."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            table=quote(model._meta.db_table),
+            user=quote(model._meta.get_field('user').column),
+            target=quote(model._meta.get_field(field).column),
+        ), [user.pk, ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert_links(model, field, user, ids):
+    """Создаёт связи и возвращает id, для которых строка вставлена.
+
+    На PostgreSQL строки, вставленные параллельным запросом, не
+    попадают в результат; на других БД полагаемся на проверку выше.
+    """
+    if not is_postgresql():
+        model.objects.bulk_create(
+            [model(user=user, **{f'{field}_id': pk}) for pk in ids],
+            ignore_conflicts=True
+        )
+        return ids
+    return returning(
+        'INSERT INTO {table} ({user}, {target}) '
+        'SELECT %s, target FROM unnest(%s::bigint[]) AS target '
+        'ON CONFLICT DO NOTHING RETURNING {target}',
+        model, field, user, ids
+    )
+
+
+def delete_links(model, field, user, ids):
+    """Удаляет связи и возвращает id, для которых строка удалена."""
+    if not is_postgresql():
+        model.objects.filter(user=user, **{f'{field}__in': ids}).delete()
+        return ids
+    return returning(
+        'DELETE FROM {table} WHERE {user} = %s AND {target} = ANY(%s) '
+        'RETURNING {target}',
+        model, field, user, ids
+    )
+
+
+def apply_bulk(request, model, field, targets, add):
+    """Добавляет или удаляет связи пользователя с целым списком объектов.
+
+    Наличие объектов и связей проверяется одним запросом, запись
+    выполняется одним INSERT или одним DELETE ... IN.
+    Возвращает статусы по каждому id и id изменённых объектов:
+    изменёнными считаются только строки, которые этот запрос
+    действительно вставил или удалил, а проигравшие гонку
+    параллельному запросу получают статус exists или absent.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    user = request.user
+    present = dict(targets.filter(pk__in=ids).order_by().annotate(
+        present=Exists(model.objects.filter(
+            user=user, **{field: OuterRef('pk')}))
+    ).values_list('pk', 'present'))
+    if add:
+        changed = [pk for pk in ids if present.get(pk) is False]
+        if changed:
+            changed = insert_links(model, field, user, changed)
+        done, unchanged = ADDED, EXISTS
+    else:
+        changed = [pk for pk in ids if present.get(pk)]
+        if changed:
+            changed = delete_links(model, field, user, changed)
+        done, unchanged = REMOVED, ABSENT
+    changed_ids = set(changed)
+    results = [
+        {'id': pk, 'status': (
+            NOT_FOUND if pk not in present
+            else done if pk in changed_ids else unchanged
+        )}
+        for pk in ids
+    ]
+    return results, [pk for pk in ids if pk in changed_ids]
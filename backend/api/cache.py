@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import transaction
+
+from foodgram.cache import get_cache
+from recipes.models import CatalogVersion
+
+recipe_cache = get_cache('recipe', settings.RECIPE_CACHE)
+
+
+def catalog_version(request):
+    """Версия справочников, прочитанная один раз за запрос."""
+    if request is None:
+        return CatalogVersion.current()
+    if not hasattr(request, 'catalog_version'):
+        request.catalog_version = CatalogVersion.current()
+    return request.catalog_version
+
+
+def get_recipe_representation(recipe, request, serialize):
+    """Возвращает не зависящую от пользователя часть представления рецепта.
+
+    Ссылки на картинки абсолютные, поэтому записи хранятся
+    отдельно для каждого базового адреса. Ревизия записи — время
+    изменения рецепта и версия справочников: запись с другой
+    ревизией считается промахом, так процессы, до которых не дошла
+    инвалидация, не отдают старые названия тегов и ингредиентов.
+    """
+    base_url = request.build_absolute_uri('/') if request else ''
+    revision = (recipe.updated_at, catalog_version(request))
+    entry = recipe_cache.get(recipe.pk)
+    if entry is None or entry['revision'] != revision:
+        entry = {'revision': revision, 'data': {}}
+    data = entry['data'].get(base_url)
+    if data is None:
+        data = serialize(recipe)
+        recipe_cache.set(recipe.pk, {
+            'revision': revision,
+            'data': {**entry['data'], base_url: data},
+        })
+    return data
+
+
+def invalidate_recipes(recipe_ids):
+    """Сбрасывает записи рецептов после фиксации транзакции."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: recipe_cache.delete_many(recipe_ids))
+
+
+def invalidate_all():
+    """Сбрасывает представления всех рецептов во всех процессах.
+
+    Новая версия справочников меняет ревизию записей кэша и ETag,
+    так что это видят и процессы, где кэш не очищен.
+    """
+    CatalogVersion.bump()
+    transaction.on_commit(recipe_cache.clear)
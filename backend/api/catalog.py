@@ -0,0 +1,38 @@
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.cache import LRUCache
+
+catalog_cache = LRUCache(settings.CATALOG_CACHE_SIZE)
+
+
+def catalog_response(request, name, version, get_data):
+    """Ответ справочника из заранее сериализованных и сжатых байтов.
+
+    Байты строятся один раз на версию справочника; клиенту с
+    совпадающим If-None-Match отдаётся 304 без тела.
+    """
+    gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    # Сильный валидатор у каждого представления свой, иначе кэши
+    # могут перепутать сжатое тело с несжатым.
+    etag = f'"{name}-{version}-gz"' if gzipped else f'"{name}-{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = catalog_cache.get((name, version))
+        if content is None:
+            body = JSONRenderer().render(get_data())
+            content = body, gzip.compress(body)
+            catalog_cache.set((name, version), content)
+        body, compressed = content
+        response = HttpResponse(body, content_type='application/json')
+        if gzipped:
+            response.content = compressed
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
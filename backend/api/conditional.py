@@ -0,0 +1,39 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+VALIDATOR_FIELDS = ('id', 'pub_date', 'updated_at', 'author')
+
+
+def recipes_etag(recipes, *extra):
+    """ETag по ревизиям рецептов и флагам пользователя.
+
+    Флаги входят в подпись, потому что меняют представление,
+    не меняя updated_at.
+    """
+    signature = repr((extra, [
+        (recipe.pk, recipe.updated_at.isoformat(), recipe.is_favorited,
+         recipe.is_in_shopping_cart, recipe.is_author_subscribed)
+        for recipe in recipes
+    ]))
+    return f'"{hashlib.sha1(signature.encode()).hexdigest()}"'
+
+
+def not_modified(request, etag):
+    """Ответ 304, если у клиента актуальная версия, иначе None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        add_validators(response, etag)
+    return response
+
+
+def add_validators(response, etag, recipes=()):
+    response['ETag'] = etag
+    last_modified = max(
+        (recipe.updated_at for recipe in recipes), default=None)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
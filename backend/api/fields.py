@@ -1,15 +1,75 @@
 import base64
+import binascii
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from recipes.images import current_variant
+from .parsers import SNIFF_SIZE, RequestEntityTooLarge, sniff_image
+
 
 class Base64ImageField(serializers.ImageField):
     """Сериализатор для декодирования изображения base64 для модели Recipe."""
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            format, separator, imgstr = data.partition(';base64,')
+            if not separator:
+                self.fail('invalid_image')
+            if len(imgstr) * 3 // 4 > settings.IMAGE_UPLOAD_MAX_SIZE:
+                raise RequestEntityTooLarge()
+            try:
+                header = base64.b64decode(imgstr[:SNIFF_SIZE * 4 // 3])
+                ext = sniff_image(header)
+                content = base64.b64decode(imgstr) if ext else None
+            except (binascii.Error, ValueError):
+                ext = None
+            if ext is None:
+                self.fail('invalid_image')
+            data = ContentFile(content, name='temp.' + ext)
         return super().to_internal_value(data)
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """Список первичных ключей, разрешаемый одним запросом IN.
+
+    Все отсутствующие ключи попадают в одну ошибку валидации.
+    """
+
+    child = serializers.IntegerField(min_value=1)
+    default_error_messages = {
+        'does_not_exist': 'Объекты не найдены: {pk_values}.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        objects = self.queryset.in_bulk(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [objects[pk] for pk in pks]
+
+    def to_representation(self, value):
+        if hasattr(value, 'all'):
+            value = value.all()
+        return [obj.pk for obj in value]
+
+
+class ImageVariantField(serializers.ImageField):
+    """Ссылка на уменьшенную копию картинки.
+
+    Пока копия не готова, отдаётся оригинал.
+    """
+
+    def __init__(self, original, **kwargs):
+        self.original = original
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return current_variant(instance, self.original, self.source)
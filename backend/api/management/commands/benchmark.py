@@ -0,0 +1,103 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmark import (ENDPOINTS, Benchmark, load_budgets,
+                           save_budgets)
+from recipes import dataset
+from users.models import User
+
+PASSWORD = 'Bench-Passw0rd'
+
+
+class Command(BaseCommand):
+    help = ('Замер запросов к API на тестовой БД: число SQL-запросов, '
+            'p50/p95 времени ответа и размер ответа')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--users', type=int, default=30)
+        parser.add_argument('--recipes', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не пересоздавать тестовую БД и набор данных',
+        )
+        parser.add_argument(
+            '--update-budgets', action='store_true',
+            help='Записать текущее число запросов как бюджет',
+        )
+        parser.add_argument('--json', help='Сохранить замеры в файл')
+        parser.add_argument(
+            '--skip', action='append', default=[], metavar='ENDPOINT',
+            help='Не замерять эндпоинт (например, PDF без wkhtmltopdf); '
+                 'его бюджет сохраняется',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                results = self.run(options)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump([result._asdict() for result in results], file,
+                          ensure_ascii=False, indent=2)
+        failed = [result for result in results if result.errors]
+        if failed:
+            raise CommandError('\n'.join(
+                f'{result.name}: {"; ".join(result.errors)}'
+                for result in failed))
+        if options['update_budgets']:
+            save_budgets(results, kept={
+                name: budget for name, budget in load_budgets().items()
+                if name in options['skip']
+            })
+            self.stdout.write(self.style.SUCCESS('Бюджеты обновлены.'))
+            return
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
+
+    def run(self, options):
+        readers = User.objects.filter(
+            owner__isnull=False, author_recipe__isnull=False
+        ).distinct().order_by('pk')
+        if not readers.exists():
+            dataset.generate(
+                users=options['users'],
+                recipes=options['recipes'],
+                seed=options['seed'],
+            )
+        reader = readers.first()
+        benchmark = Benchmark(reader, PASSWORD, options['repeat'])
+        # Новые бюджеты пишутся только по прогону без ошибок статуса
+        # и масштабирования, старые бюджеты при этом не проверяются.
+        budgets = {} if options['update_budgets'] else load_budgets()
+        return [
+            benchmark.run(endpoint, budgets.get(endpoint.name))
+            for endpoint in ENDPOINTS if endpoint.name not in options['skip']
+        ]
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<28}{"status":>8}{"queries":>9}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"bytes":>9}')
+        for result in results:
+            line = (
+                f'{result.name:<28}{result.status:>8}{result.queries:>9}'
+                f'{result.p50:>10.2f}{result.p95:>10.2f}{result.size:>9}')
+            self.stdout.write(
+                self.style.ERROR(line) if result.errors else line)
@@ -1,8 +1,241 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.cache import Generations, LRUCache
+
+count_cache = LRUCache(
+    settings.PAGINATION_COUNT_CACHE['MAX_SIZE'],
+    settings.PAGINATION_COUNT_CACHE['TIMEOUT'],
+)
+count_generations = Generations('pagination_count')
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, запоминающий COUNT(*) больших выборок на время TTL.
+
+    Создание и удаление рецептов, пользователей и подписок сбрасывает
+    запомненные количества во всех процессах; прочие изменения
+    (например, избранное) попадают в количество не позже чем через
+    TTL. Если по запомненному количеству страница оказалась пустой
+    или несуществующей, количество пересчитывается.
+    """
+
+    @property
+    def count(self):
+        if not hasattr(self, '_count'):
+            self._key = (count_generations.get(),
+                         str(self.object_list.values('pk').query))
+            self._count = count_cache.get(self._key)
+            self._cached = self._count is not None
+            if not self._cached:
+                self._count = self.fresh_count()
+        return self._count
+
+    def fresh_count(self):
+        count = super().count
+        if count >= settings.PAGINATION_COUNT_CACHE['MIN_COUNT']:
+            count_cache.set(self._key, count)
+        else:
+            count_cache.delete(self._key)
+        return count
+
+    def page(self, number):
+        try:
+            number = self.validate_number(number)
+        except EmptyPage:
+            if not self.recount():
+                raise
+            number = self.validate_number(number)
+        page = self.slice(number)
+        if number > 1 and not page.object_list and self.recount():
+            page = self.slice(self.validate_number(number))
+        return page
+
+    def slice(self, number):
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def recount(self):
+        """Пересчитывает запомненное количество; False, если оно точное."""
+        if not getattr(self, '_cached', False):
+            return False
+        self._count, self._cached = self.fresh_count(), False
+        self.__dict__.pop('num_pages', None)
+        return True
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу сортировки без COUNT и OFFSET.
+
+    Курсор хранит значения полей сортировки крайней записи страницы,
+    поэтому стоимость запроса не зависит от глубины страницы.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, obj, reverse):
+        position = [
+            self.field_value(obj, field.lstrip('-'))
+            for field in self.ordering
+        ]
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': reverse}).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor
+        )
+
+    def decode_cursor(self, request, model):
+        """Позиция и направление из курсора.
+
+        Значения приводятся к типам полей сортировки, чтобы подделанный
+        курсор давал 404, а не ошибку в запросе.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def field_value(obj, field):
+        value = getattr(obj, field)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
 
 
 class PageLimitPagination(PageNumberPagination):
-    """Пагинатор."""
+    """Пагинатор.
+
+    По умолчанию постраничный, с приблизительным общим количеством.
+    С параметром cursor (пустым для первой страницы) переключается
+    на пагинацию по ключу, если не задан ни один из параметров
+    view.keyset_disabled_by: они задают свой порядок (например,
+    релевантность поиска), который курсор не сохранил бы.
+    """
 
     page_size_query_param = 'limit'
     page_size = 6
+    django_paginator_class = CachedCountPaginator
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        cursor_param = self.keyset_pagination_class.cursor_query_param
+        disabled_by = getattr(view, 'keyset_disabled_by', ())
+        if cursor_param in request.query_params and not any(
+                request.query_params.get(param, '').strip()
+                for param in disabled_by):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException, UnsupportedMediaType
+from rest_framework.parsers import FileUploadParser, MultiPartParser
+
+# Ключ, под которым FileUploadParser кладёт тело запроса в request.data.
+RAW_UPLOAD_FIELD = 'file'
+
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SNIFF_SIZE = 12
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл слишком большой.'
+    default_code = 'too_large'
+
+
+def sniff_image(header):
+    """Расширение изображения по первым байтам или None."""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, проверяя размер и формат.
+
+    Слишком большие и не похожие на картинку файлы отклоняются
+    по первым фрагментам, не дожидаясь конца загрузки.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # Остальные поля формы ограничены DATA_UPLOAD_MAX_MEMORY_SIZE.
+        limit = (settings.IMAGE_UPLOAD_MAX_SIZE
+                 + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0))
+        if content_length and content_length > limit:
+            raise RequestEntityTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.file.close()
+            raise RequestEntityTooLarge()
+        if start == 0 and sniff_image(raw_data[:SNIFF_SIZE]) is None:
+            self.file.close()
+            raise UnsupportedMediaType(
+                self.content_type, 'Файл не является изображением.')
+        return super().receive_data_chunk(raw_data, start)
+
+
+def use_image_upload_handler(request):
+    request._request.upload_handlers = [
+        ImageUploadHandler(request._request)]
+
+
+class ImageMultiPartParser(MultiPartParser):
+    """multipart/form-data с потоковой загрузкой картинки."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        use_image_upload_handler(parser_context['request'])
+        return super().parse(stream, media_type, parser_context)
+
+
+class ImageUploadParser(FileUploadParser):
+    """Картинка в теле запроса как есть, без base64."""
+
+    media_type = 'image/*'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        use_image_upload_handler(parser_context['request'])
+        return super().parse(stream, media_type, parser_context)
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        return 'upload.' + media_type.split(';')[0].split('/')[-1].strip()
+
+
+def upload_data(data, field):
+    """Данные для сериализатора: сырую загрузку кладёт в поле field."""
+    if RAW_UPLOAD_FIELD in data and field not in data:
+        return {field: data[RAW_UPLOAD_FIELD]}
+    return data
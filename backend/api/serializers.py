@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch, prefetch_related_objects
 from django.db.transaction import atomic
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
@@ -7,8 +8,12 @@ from rest_framework.validators import UniqueTogetherValidator
 
 from recipes.models import (Ingredients, Tag, Recipes,
                             IngredientsInRecipe, Favorite, Basket)
+from recipes import shopping_cart
+from recipes.search import update_search_vector
 from users.models import UserSubscribers
-from .fields import Base64ImageField
+from .cache import get_recipe_representation
+from .fields import (Base64ImageField, ImageVariantField,
+                     PrimaryKeyListField)
 
 User = get_user_model()
 
@@ -17,15 +22,20 @@ class GetUserSerializer(UserSerializer):
     """Сериализатор для получение информации о пользователе."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_small = ImageVariantField('avatar')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username',
                   'first_name', 'last_name',
-                  'is_subscribed', 'avatar')
+                  'is_subscribed', 'avatar', 'avatar_small')
         read_only_fields = ('avatar',)
 
     def get_is_subscribed(self, obj):
+        if self.context.get('shared'):
+            return None
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return bool(
             request
@@ -88,6 +98,8 @@ class GetRecipesSerializer(serializers.ModelSerializer):
     author = GetUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_card = ImageVariantField('image')
+    image_detail = ImageVariantField('image')
 
     class Meta:
         model = Recipes
@@ -95,40 +107,84 @@ class GetRecipesSerializer(serializers.ModelSerializer):
             'id', 'tags', 'author',
             'ingredients', 'is_favorited',
             'is_in_shopping_cart',
-            'name', 'image', 'text',
+            'name', 'image', 'image_card', 'image_detail', 'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, object):
+        if self.context.get('shared'):
+            return None
+        if hasattr(object, 'is_favorited'):
+            return object.is_favorited
         request = self.context.get('request')
         return bool(request and request.user.is_authenticated
                     and object.favorite.filter(user=request.user).exists())
 
     def get_is_in_shopping_cart(self, object):
+        if self.context.get('shared'):
+            return None
+        if hasattr(object, 'is_in_shopping_cart'):
+            return object.is_in_shopping_cart
         request = self.context.get('request')
         return bool(
             request and request.user.is_authenticated
             and request.user.shopping_cart.filter(recipe=object).exists())
 
+    def _shared_representation(self, instance):
+        """Общая часть: флаги пользователя в ней не вычисляются."""
+        root = self.root
+        context = root._context
+        root._context = {**context, 'shared': True}
+        try:
+            return super().to_representation(instance)
+        finally:
+            root._context = context
+
+    def to_representation(self, instance):
+        """Берёт общую часть из кэша и добавляет флаги пользователя."""
+        data = dict(get_recipe_representation(
+            instance,
+            self.context.get('request'),
+            self._shared_representation
+        ))
+        data['author'] = dict(data['author'])
+        data['author']['is_subscribed'] = (
+            self.fields['author'].get_is_subscribed(instance.author))
+        data['is_favorited'] = self.get_is_favorited(instance)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(instance)
+        return data
+
+
+class AmountIngredientsListSerializer(serializers.ListSerializer):
+    """Разрешает id ингредиентов всего списка одним запросом IN."""
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        pks = {item['id'] for item in items}
+        ingredients = Ingredients.objects.in_bulk(pks)
+        missing = sorted(pks - ingredients.keys())
+        if missing:
+            raise ValidationError(f'Ингредиенты не найдены: {missing}.')
+        for item in items:
+            item['id'] = ingredients[item['id']]
+        return items
+
 
 class AmountIngredientsInRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для внесения количества ингридиента в рецепт."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredients.objects.all())
+    id = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = IngredientsInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = AmountIngredientsListSerializer
 
 
 class PostRecipesSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    tags = PrimaryKeyListField(queryset=Tag.objects.all())
     image = Base64ImageField(required=False)
     ingredients = AmountIngredientsInRecipeSerializer(many=True)
 
@@ -160,11 +216,11 @@ class PostRecipesSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         ingredients = data.get('ingredients', [])
-        if not ingredients:
+        if not ingredients and (not self.partial or 'ingredients' in data):
             raise ValidationError('Добавьте хотя бы один ингредиент.')
 
         tags = data.get('tags', [])
-        if not tags:
+        if not tags and (not self.partial or 'tags' in data):
             raise ValidationError('Добавьте хотя бы один тег.')
         return data
 
@@ -189,19 +245,67 @@ class PostRecipesSerializer(serializers.ModelSerializer):
             recipe=recipe
         )
         recipe.tags.set(tags)
+        update_search_vector([recipe.pk])
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """Меняет только отличающиеся строки ингредиентов рецепта.
+
+        Возвращает изменения количеств для списков покупок.
+        """
+        current = {
+            row.ingredient_id: row for row in recipe.name_recipe.all()
+        }
+        new = {ingredient['id'].id: ingredient for ingredient in ingredients}
+        deltas = {}
+        changed = []
+        for ingredient_id, row in current.items():
+            if ingredient_id not in new:
+                deltas[ingredient_id] = -row.amount
+                continue
+            amount = new[ingredient_id]['amount']
+            if row.amount != amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                changed.append(row)
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in new
+        ]
+        if removed:
+            IngredientsInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientsInRecipe.objects.bulk_update(changed, ('amount',))
+        added = [
+            ingredient for ingredient_id, ingredient in new.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            self.create_ingredient(ingredients=added, recipe=recipe)
+        for ingredient in added:
+            deltas[ingredient['id'].id] = ingredient['amount']
+        return deltas
+
     @atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', None)
         tags = validated_data.pop('tags', None)
-        instance.tags.clear()
-        instance.ingredients.clear()
-        instance.tags.set(tags)
-        self.create_ingredient(recipe=instance, ingredients=ingredients)
-        return super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            deltas = self.update_ingredients(instance, ingredients)
+            if deltas:
+                shopping_cart.change_recipe(instance.pk, deltas)
+        instance = super().update(instance, validated_data)
+        if ingredients is not None or {'name', 'text'} & validated_data.keys():
+            update_search_vector([instance.pk])
+        return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], 'tags', Prefetch(
+            'name_recipe',
+            queryset=IngredientsInRecipe.objects.select_related('ingredient')
+        ))
         request = self.context.get('request')
         context = {'request': request}
         return GetRecipesSerializer(instance, context=context).data
@@ -220,9 +324,11 @@ class ShortLinkSerializer(serializers.ModelSerializer):
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для чтения краткой информации о рецепте."""
 
+    image_card = ImageVariantField('image')
+
     class Meta:
         model = Recipes
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_card', 'cooking_time')
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -263,26 +369,38 @@ class ShopBasketSerializer(FavoriteSerializer):
         return ShortRecipeSerializer(instance.recipe, context=context).data
 
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
 class SubscribeToUserSerializer(GetUserSerializer):
     """Сериализатор для подписки и отписки пользователей."""
 
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
         fields = ('is_subscribed', 'email', 'username',
                   'first_name', 'last_name', 'recipes',
                   'recipes_count',
-                  'avatar', 'id')
+                  'avatar', 'avatar_small', 'id')
         read_only_fields = ('__all__',)
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes = Recipes.objects.filter(author=obj.id)
-        limit = request.GET.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = Recipes.objects.filter(author=obj.id)
+            limit = get_recipes_limit(request)
+            if limit is not None:
+                recipes = recipes[:limit]
         serializer = ShortRecipeSerializer(
             recipes,
             context={'request': request},
@@ -290,9 +408,6 @@ class SubscribeToUserSerializer(GetUserSerializer):
         )
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return Recipes.objects.filter(author=obj.id).count()
-
 
 class CreateSubsribeSerializer(serializers.ModelSerializer):
 
@@ -318,3 +433,13 @@ class CreateSubsribeSerializer(serializers.ModelSerializer):
         return SubscribeToUserSerializer(
             instance.subscriber,
             context=self.context).data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетного добавления или удаления."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
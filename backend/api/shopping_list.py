@@ -0,0 +1,66 @@
+import csv
+import hashlib
+
+import pdfkit
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from foodgram.cache import get_cache
+from recipes.models import ShoppingCartItem
+
+TITLE = 'Продукты для покупки:'
+CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+pdf_cache = get_cache('shopping_list_pdf', settings.SHOPPING_LIST_PDF_CACHE)
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def get_rows(user):
+    return ShoppingCartItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).order_by('ingredient__name')
+
+
+def iter_text(user):
+    yield f'{TITLE}\n'
+    for name, measurement_unit, amount in get_rows(user).iterator():
+        yield f' - {name} --- {amount} {measurement_unit}\n'
+
+
+def iter_csv(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for name, measurement_unit, amount in get_rows(user).iterator():
+        yield writer.writerow((name, amount, measurement_unit))
+
+
+def render_pdf(user):
+    """PDF целиком; рендер кэшируется по версии корзины.
+
+    Версия — хэш содержимого списка: чтение итогов дёшево,
+    дорог только рендер. PDF строится до ответа, чтобы ошибка
+    wkhtmltopdf стала ответом с ошибкой, а не обрезанным файлом.
+    """
+    rows = list(get_rows(user))
+    version = hashlib.sha1(repr(rows).encode()).hexdigest()
+    key = f'{user.pk}:{version}'
+    content = pdf_cache.get(key)
+    if content is None:
+        html = render_to_string(
+            'api/shopping_list.html', {'title': TITLE, 'rows': rows})
+        content = pdfkit.from_string(html, False)
+        pdf_cache.set(key, content)
+    return content
+
+
+# Потоковые форматы; PDF отдаётся целиком через render_pdf.
+EXPORTERS = {
+    'txt': iter_text,
+    'csv': iter_csv,
+}
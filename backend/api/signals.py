@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredients, IngredientsInRecipe, Recipes, Tag
+from recipes.search import update_search_vector
+from users.models import UserSubscribers
+from .authentication import token_cache, token_generations
+from .autocomplete import ingredient_index
+from .cache import invalidate_all, invalidate_recipes, recipe_cache
+from .pagination import count_generations
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes([instance.pk])
+    else:
+        invalidate_all()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def catalog_changed(sender, **kwargs):
+    # Версию справочников уже увеличил recipes.signals, здесь
+    # только освобождается кэш этого процесса.
+    transaction.on_commit(recipe_cache.clear)
+    if sender is Ingredients:
+        transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vector(
+            Recipes.objects.filter(ingredients=instance).values('pk'))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_recipes(
+        Recipes.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserSubscribers)
+def collection_changed(sender, created=True, **kwargs):
+    """Новые и удалённые объекты меняют количества в выдаче.
+
+    Отписки сбрасывают количества в видах: post_delete у подписок
+    лишил бы их удаление одним запросом.
+    """
+    if created:
+        transaction.on_commit(count_generations.bump)
+
+
+def invalidate_tokens(keys):
+    """Сбрасывает токены в этом процессе и, через поколения, в остальных."""
+    keys = list(keys)
+
+    def invalidate():
+        token_generations.bump_many(keys)
+        token_cache.delete_many(keys)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Смена пароля, деактивация и правка профиля сбрасывают кэш токена."""
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True))
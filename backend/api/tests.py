@@ -0,0 +1,147 @@
+import base64
+import io
+import json
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredients, Recipes, Tag
+from users.models import User
+
+
+def encode_cursor(position, reverse=False):
+    return base64.urlsafe_b64encode(
+        json.dumps({'p': position, 'r': reverse}).encode()
+    ).decode()
+
+
+class KeysetPaginationTest(APITestCase):
+    url = '/api/recipes/'
+
+    def setUp(self):
+        author = User.objects.create(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия',
+        )
+        now = timezone.now()
+        self.recipes = []
+        for number in range(8):
+            recipe = Recipes.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10)
+            # Пары рецептов с одинаковой датой проверяют второй ключ.
+            Recipes.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(hours=number // 2))
+            self.recipes.append(recipe.pk)
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url = response.data['next']
+        return ids, pages
+
+    def test_pages_cover_all_recipes_once(self):
+        ids, pages = self.walk(f'{self.url}?cursor=&limit=3')
+        expected = list(Recipes.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(f'{self.url}?cursor=&limit=3').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [recipe['id'] for recipe in back['results']],
+            [recipe['id'] for recipe in first['results']]
+        )
+
+    def test_invalid_cursor_values_return_404(self):
+        for position in (
+            ['notadate', 1],
+            [timezone.now().isoformat(), 'x'],
+            [{'a': 1}, 1],
+            [None, 1],
+            [timezone.now().isoformat()],
+        ):
+            with self.subTest(position=position):
+                response = self.client.get(
+                    self.url, {'cursor': encode_cursor(position)})
+                self.assertEqual(response.status_code, 404)
+
+    def test_search_falls_back_to_page_numbers(self):
+        response = self.client.get(
+            self.url, {'cursor': '', 'limit': 3, 'search': 'Рецепт'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 8)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_malformed_cursor_returns_404(self):
+        response = self.client.get(self.url, {'cursor': 'не курсор'})
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipeWriteQueriesTest(APITestCase):
+    url = '/api/recipes/'
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия',
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.ingredients = [
+            Ingredients.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        ]
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, 'PNG')
+        self.image = 'data:image/png;base64,' + base64.b64encode(
+            buffer.getvalue()).decode()
+
+    def create(self, count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 5,
+                'image': self.image, 'tags': [self.tag.pk],
+                'ingredients': [
+                    {'id': ingredient.pk, 'amount': 10}
+                    for ingredient in self.ingredients[:count]
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ingredients']), count)
+        self.assertIs(response.data['is_favorited'], False)
+        self.assertIs(response.data['author']['is_subscribed'], False)
+        return len(queries)
+
+    def test_create_queries_do_not_depend_on_ingredients(self):
+        self.create(1)
+        self.assertEqual(self.create(2), self.create(10))
+
+
+class Base64ImageFieldTest(APITestCase):
+
+    def test_data_url_without_base64_is_rejected(self):
+        user = User.objects.create(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия',
+        )
+        self.client.force_authenticate(user)
+        for avatar in ('data:image/png,AAAA', 'data:image/png;base64,%%%'):
+            with self.subTest(avatar=avatar):
+                response = self.client.put(
+                    '/api/users/me/avatar/', {'avatar': avatar},
+                    format='json')
+                self.assertEqual(response.status_code, 400)
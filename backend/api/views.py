@@ -1,8 +1,12 @@
-from django.db.models import Sum
+from django.db.models import (Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
+from django.db import transaction
+from django.db.transaction import atomic
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
 from rest_framework.permissions import IsAuthenticated
@@ -11,16 +15,38 @@ from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS
 
 from users.models import User, UserSubscribers
-from recipes.models import (Ingredients, Tag, Recipes, IngredientsInRecipe)
+from recipes import feed, shopping_cart
+from recipes.counters import change_counter
+from recipes.models import (Ingredients, Tag, Recipes, IngredientsInRecipe,
+                            Favorite, Basket, CatalogVersion, FeedEntry)
+from .autocomplete import ingredient_index
+from .bulk import apply_bulk
+from .cache import catalog_version
+from .catalog import catalog_response
+from .conditional import (VALIDATOR_FIELDS, add_validators, not_modified,
+                          recipes_etag)
 from .filtres import RecipeFilter, IngredientsFilter
-from .pagination import PageLimitPagination
+from .pagination import (KeysetPagination, PageLimitPagination,
+                         count_generations)
+from .parsers import ImageMultiPartParser, ImageUploadParser, upload_data
 from .permissions import AuthorOrReadOnly
+from .renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                        TextShoppingListRenderer)
+from .shopping_list import EXPORTERS, render_pdf
 
 from .serializers import (IngredientsSerializer, TagSerializer,
                           GetRecipesSerializer, PostRecipesSerializer,
                           AvatarSerializer, ShopBasketSerializer,
                           FavoriteSerializer, SubscribeToUserSerializer,
-                          CreateSubsribeSerializer, GetUserSerializer)
+                          CreateSubsribeSerializer, GetUserSerializer,
+                          get_recipes_limit)
+
+IMAGE_PARSERS = (JSONParser, ImageMultiPartParser, ImageUploadParser)
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    Basket: 'shopping_cart_count',
+}
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -29,6 +55,17 @@ class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     pagination_class = PageLimitPagination
     serializer_class = GetUserSerializer
+    keyset_ordering = ('date_joined', 'id')
+
+    def get_queryset(self):
+        """Флаг подписки считается в том же запросе, что и страница."""
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated and self.action in ('list', 'retrieve'):
+            queryset = queryset.annotate(is_subscribed=Exists(
+                UserSubscribers.objects.filter(
+                    user=user, subscriber=OuterRef('pk'))))
+        return queryset
 
     @action(
         methods=('get',),
@@ -46,13 +83,14 @@ class UserViewSet(DjoserUserViewSet):
         methods=('put',),
         detail=False,
         url_path='me/avatar',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        parser_classes=IMAGE_PARSERS
     )
     def me_avatar(self, request):
         serializer = AvatarSerializer(
             instance=request.user,
             context={'request': request},
-            data=request.data
+            data=upload_data(request.data, 'avatar')
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -74,6 +112,7 @@ class UserViewSet(DjoserUserViewSet):
         methods=('post',),
         permission_classes=(IsAuthenticated,)
     )
+    @atomic
     def subscribe(self, request, id=None):
         subscriber = get_object_or_404(User, pk=id)
         data = {
@@ -84,10 +123,14 @@ class UserViewSet(DjoserUserViewSet):
             data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        change_counter(
+            User.objects.filter(pk=subscriber.id), 'subscribers_count', 1)
+        feed.follow(request.user.id, [subscriber.id])
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @atomic
     def delete_subscribe(self, request, id=None):
         subscriber = get_object_or_404(User, pk=id)
         obj = UserSubscribers.objects.filter(
@@ -97,14 +140,60 @@ class UserViewSet(DjoserUserViewSet):
         if obj[0] == 0:
             return Response({'Вы не подписаны на данного пользователя'},
                             status=status.HTTP_400_BAD_REQUEST)
+        change_counter(
+            User.objects.filter(pk=subscriber.id), 'subscribers_count', -1)
+        feed.unfollow(request.user.id, [subscriber.id])
+        transaction.on_commit(count_generations.bump)
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='subscribe',
+        url_name='subscribe-bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    @atomic
+    def subscribe_bulk(self, request):
+        """Подписка на список авторов или отписка от них: {"ids": [...]}."""
+        add = request.method == 'POST'
+        results, changed = apply_bulk(
+            request, UserSubscribers, 'subscriber',
+            User.objects.exclude(pk=request.user.pk), add
+        )
+        change_counter(
+            User.objects.filter(pk__in=changed), 'subscribers_count',
+            1 if add else -1
+        )
+        if changed:
+            transaction.on_commit(count_generations.bump)
+        if add:
+            feed.follow(request.user.id, changed)
+        else:
+            feed.unfollow(request.user.id, changed)
+        return Response({'results': results})
+
     @action(detail=False, methods=['get'],
             permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
+        """Страница подписок за фиксированное число запросов."""
         user = request.user
-        subscriptions_users = User.objects.filter(subscriber__user=user)
+        subscriptions_users = User.objects.filter(
+            subscriber__user=user
+        ).annotate(
+            is_subscribed=Value(True),
+        ).order_by(*self.keyset_ordering)
         page = self.paginate_queryset(subscriptions_users)
+        recipes = Recipes.objects.filter(author__in=page)
+        limit = get_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.latest_per_author(limit)
+        prefetch_related_objects(page, Prefetch(
+            'author_recipe',
+            queryset=recipes.only('id', 'name', 'image', 'image_card',
+                                  'cooking_time', 'author'),
+            to_attr='limited_recipes'
+        ))
         serializer = SubscribeToUserSerializer(
             page, many=True, context={'request': request}
         )
@@ -120,6 +209,12 @@ class TagViewSet(mixins.RetrieveModelMixin,
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return catalog_response(
+            request, 'tags', CatalogVersion.current(),
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+
 
 class IngredientsViewSet(mixins.RetrieveModelMixin,
                          mixins.ListModelMixin,
@@ -132,6 +227,16 @@ class IngredientsViewSet(mixins.RetrieveModelMixin,
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientsFilter
 
+    def list(self, request, *args, **kwargs):
+        """Полный справочник с ETag или поиск по индексу в памяти."""
+        name = request.query_params.get('name', '')
+        if name:
+            return Response(ingredient_index.search(name))
+        return catalog_response(
+            request, 'ingredients', CatalogVersion.current(),
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+
 
 class RecipesViewSet(viewsets.ModelViewSet):
     """Добавление, отображение, изменение рецептов."""
@@ -141,12 +246,111 @@ class RecipesViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (AuthorOrReadOnly,)
+    parser_classes = IMAGE_PARSERS
+    keyset_ordering = ('-pub_date', '-id')
+    keyset_disabled_by = ('search',)
+
+    def get_queryset(self):
+        """Рецепты с флагами пользователя и подгруженными связями.
+
+        Количество запросов на страницу не зависит от её размера.
+        """
+        user = self.request.user
+        if user.is_authenticated:
+            is_favorited = Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            is_in_shopping_cart = Exists(Basket.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            is_subscribed = Exists(UserSubscribers.objects.filter(
+                user=user, subscriber=OuterRef('pk')))
+            is_author_subscribed = Exists(UserSubscribers.objects.filter(
+                user=user, subscriber=OuterRef('author')))
+        else:
+            is_favorited = is_in_shopping_cart = Value(False)
+            is_subscribed = is_author_subscribed = Value(False)
+        return Recipes.objects.defer('search_vector').annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+            is_author_subscribed=is_author_subscribed,
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'name_recipe',
+                queryset=IngredientsInRecipe.objects.select_related(
+                    'ingredient')
+            ),
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(is_subscribed=is_subscribed)
+            ),
+        )
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return GetRecipesSerializer
         return PostRecipesSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        if 'data' in kwargs:
+            kwargs['data'] = upload_data(kwargs['data'], 'image')
+        return super().get_serializer(*args, **kwargs)
+
+    def get_validator_queryset(self, queryset):
+        """Лёгкая выборка для ETag: без связей и тяжёлых полей."""
+        return queryset.prefetch_related(None).only(*VALIDATOR_FIELDS)
+
+    def list(self, request, *args, **kwargs):
+        """Лента с ETag: 304 отдаётся до загрузки и сериализации рецептов."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(self.get_validator_queryset(queryset))
+        envelope = self.get_paginated_response([]).data
+        etag = recipes_etag(page, catalog_version(request), envelope)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        recipes = self.get_queryset().in_bulk(
+            [recipe.pk for recipe in page])
+        serializer = self.get_serializer(
+            [recipes[recipe.pk] for recipe in page if recipe.pk in recipes],
+            many=True
+        )
+        response = self.get_paginated_response(serializer.data)
+        return add_validators(response, etag, page)
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = get_object_or_404(
+            self.get_validator_queryset(self.get_queryset()),
+            pk=kwargs['pk']
+        )
+        etag = recipes_etag([recipe], catalog_version(request))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(self.get_object())
+        return add_validators(Response(serializer.data), etag, [recipe])
+
+    @action(
+        detail=False,
+        url_path='feed',
+        permission_classes=(IsAuthenticated,)
+    )
+    def subscriptions_feed(self, request):
+        """Рецепты авторов из подписок, новые сверху, по курсору."""
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).only(
+                'id', 'recipe', 'pub_date'),
+            request, self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in page])
+        serializer = self.get_serializer(
+            [recipes[entry.recipe_id] for entry in page
+             if entry.recipe_id in recipes],
+            many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         methods=('get',),
         detail=True,
@@ -158,6 +362,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         data = {'short-link': short_link}
         return Response(data)
 
+    @atomic
     def favorite_shopping_cart_add_or_delete(self, serializer, pk, request):
         user = request.user
         recipe = get_object_or_404(Recipes, id=pk)
@@ -165,15 +370,21 @@ class RecipesViewSet(viewsets.ModelViewSet):
             'user': user.id,
             'recipe': recipe.id
         }
+        model = serializer.Meta.model
+        in_basket = model is Basket
+        counter = RECIPE_COUNTERS[model]
 
         if request.method == 'POST':
             serializer = serializer(data=data, context={'request': request})
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            change_counter(Recipes.objects.filter(pk=recipe.id), counter, 1)
+            if in_basket:
+                shopping_cart.add_recipes(user.id, [recipe.id])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            object = serializer.Meta.model.objects.filter(
+            object = model.objects.filter(
                 user=user,
                 recipe=recipe
             ).delete()
@@ -181,6 +392,9 @@ class RecipesViewSet(viewsets.ModelViewSet):
                 return Response(
                     'Рецепт отсутствует', status=status.HTTP_400_BAD_REQUEST
                 )
+            change_counter(Recipes.objects.filter(pk=recipe.id), counter, -1)
+            if in_basket:
+                shopping_cart.remove_recipes(user.id, [recipe.id])
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(methods=('post', 'delete',),
@@ -199,25 +413,66 @@ class RecipesViewSet(viewsets.ModelViewSet):
             ShopBasketSerializer, pk, request
         )
 
-    @action(detail=False)
+    @atomic
+    def bulk_add_or_delete(self, model, request):
+        """Пакетная версия favorite_shopping_cart_add_or_delete."""
+        add = request.method == 'POST'
+        results, changed = apply_bulk(
+            request, model, 'recipe', Recipes.objects.all(), add)
+        if changed:
+            change_counter(
+                Recipes.objects.filter(pk__in=changed),
+                RECIPE_COUNTERS[model], 1 if add else -1
+            )
+            if model is Basket:
+                if add:
+                    shopping_cart.add_recipes(request.user.id, changed)
+                else:
+                    shopping_cart.remove_recipes(request.user.id, changed)
+        return Response({'results': results})
+
+    @action(methods=('post', 'delete',),
+            detail=False,
+            url_path='favorite',
+            url_name='favorite-bulk',
+            permission_classes=(IsAuthenticated,))
+    def favorite_bulk(self, request):
+        return self.bulk_add_or_delete(Favorite, request)
+
+    @action(methods=('post', 'delete',),
+            detail=False,
+            url_path='shopping_cart',
+            url_name='shopping-cart-bulk',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_bulk(self, request):
+        return self.bulk_add_or_delete(Basket, request)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(TextShoppingListRenderer,
+                          CSVShoppingListRenderer,
+                          PDFShoppingListRenderer)
+    )
     def download_shopping_cart(self, request):
-        user = request.user
-        queryset = IngredientsInRecipe.objects.filter(
-            recipe__shopping_cart__user=user.id
-        ).values('ingredient__name', 'ingredient__measurement_unit').order_by(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount'))
-        message = 'Продукты для покупки:\n'
-        for ingredient in queryset:
-            message += (
-                f' - {ingredient["ingredient__name"]} '
-                f'--- {ingredient["total_amount"]}'
-                f' {ingredient["ingredient__measurement_unit"]}\n'
+        """Выгрузка списка покупок в формате ?format=txt|csv|pdf.
+
+        txt и csv отдаются потоком, PDF — готовым файлом.
+        """
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        if renderer.format in EXPORTERS:
+            response = StreamingHttpResponse(
+                EXPORTERS[renderer.format](request.user),
+                content_type=content_type
             )
+        else:
+            response = HttpResponse(
+                render_pdf(request.user), content_type=content_type)
         file_name = 'product_list'
-        response = HttpResponse(
-            message, content_type='Content-Type: application/pdf')
         response['Content-Disposition'] = (
-            f'attachment; filename="{file_name}.pdf"'
+            f'attachment; filename="{file_name}.{renderer.format}"'
         )
         return response
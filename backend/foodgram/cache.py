@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Потокобезопасный кэш процесса с вытеснением LRU и необязательным TTL."""
+
+    def __init__(self, max_size=1024, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = (
+            time.monotonic() + self.timeout if self.timeout else None
+        )
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedCache:
+    """Обёртка над бэкендом Django с префиксом ключей.
+
+    Очистка не трогает чужие ключи бэкенда: вместо этого
+    увеличивается поколение, входящее в каждый ключ.
+    """
+
+    def __init__(self, alias, prefix, timeout=None):
+        self.backend = caches[alias]
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def _generation(self):
+        return self.backend.get_or_set(f'{self.prefix}:generation', 0, None)
+
+    def _key(self, key, generation=None):
+        if generation is None:
+            generation = self._generation()
+        return f'{self.prefix}:{generation}:{key}'
+
+    def get(self, key, default=None):
+        return self.backend.get(self._key(key), default)
+
+    def set(self, key, value):
+        self.backend.set(self._key(key), value, self.timeout)
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def delete_many(self, keys):
+        generation = self._generation()
+        self.backend.delete_many(
+            [self._key(key, generation) for key in keys])
+
+    def clear(self):
+        key = f'{self.prefix}:generation'
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            self.backend.set(key, 1, None)
+
+
+def new_generation():
+    return uuid.uuid4().hex
+
+
+class Generations:
+    """Поколения в общем бэкенде для сброса кэшей в памяти процессов.
+
+    Запись кэша процесса хранит поколение, при котором построена,
+    и считается промахом, когда общее поколение сменилось. Новые
+    поколения случайные, поэтому вытесненный бэкендом ключ тоже
+    лишь превращает записи в промахи.
+    """
+
+    def __init__(self, prefix, alias=None):
+        self.backend = caches[alias or settings.GENERATIONS_CACHE]
+        self.prefix = prefix
+
+    def _key(self, name):
+        return f'{self.prefix}:{name}'
+
+    def get(self, name=''):
+        return self.backend.get_or_set(self._key(name), new_generation, None)
+
+    def bump(self, name=''):
+        self.backend.set(self._key(name), new_generation(), None)
+
+    def bump_many(self, names):
+        self.backend.set_many(
+            {self._key(name): new_generation() for name in names}, None)
+
+
+def get_cache(prefix, options):
+    """Создаёт кэш по настройкам вида {'BACKEND', 'MAX_SIZE', 'TIMEOUT'}.
+
+    Если указан алиас общего бэкенда из CACHES, кэш разделяется
+    между процессами, иначе живёт в памяти процесса.
+    """
+    if options.get('BACKEND'):
+        return SharedCache(
+            options['BACKEND'], prefix, options.get('TIMEOUT'))
+    return LRUCache(options.get('MAX_SIZE', 1024), options.get('TIMEOUT'))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from django.core.management.utils import get_random_secret_key
 from pathlib import Path
@@ -19,21 +20,26 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'djoser',
     'rest_framework.authtoken',
+    'jobs.apps.JobsConfig',
+    'monitoring.apps.MonitoringConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -108,7 +114,7 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -134,4 +140,130 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# shared — общий для процессов кэш (по умолчанию файлы на диске).
+# Через него воркеры gunicorn узнают о сбросе своих кэшей в памяти,
+# поэтому LOCATION должен быть общим для всех воркеров. Можно
+# заменить на Redis или Memcached переменными окружения.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv(
+            'SHARED_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+# Алиас из CACHES для поколений кэшей процессов.
+GENERATIONS_CACHE = 'shared'
+
+# Кэш представлений рецептов. При нескольких воркерах gunicorn
+# укажите алиас общего бэкенда из CACHES (например, Redis),
+# иначе каждый процесс держит собственный LRU-кэш.
+RECIPE_CACHE = {
+    'BACKEND': os.getenv('RECIPE_CACHE_BACKEND'),
+    'MAX_SIZE': int(os.getenv('RECIPE_CACHE_SIZE', 2048)),
+    'TIMEOUT': None,
+}
+
+# Кэш токенов API. Выход и смена пароля видны всем воркерам сразу
+# через поколения токенов; TIMEOUT страхует от изменений в обход
+# сигналов.
+TOKEN_CACHE = {
+    'BACKEND': os.getenv('TOKEN_CACHE_BACKEND'),
+    'MAX_SIZE': 10000,
+    'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', 30)),
+}
+
+# Ключ перестановки id рецептов в короткие ссылки. Менять нельзя:
+# уже выданные ссылки перестанут раскодироваться без обращения к БД.
+SHORT_LINK_SECRET = os.getenv('SHORT_LINK_SECRET', 'foodgram-short-links')
+
+# Кэш соответствий старых коротких ссылок рецептам. Общий для
+# процессов, чтобы удаление рецепта сразу убирало ссылку у всех.
+SHORT_LINK_CACHE = {
+    'BACKEND': os.getenv('SHORT_LINK_CACHE_BACKEND', 'shared'),
+    'MAX_SIZE': 10000,
+    'TIMEOUT': None,
+}
+# Время кэширования редиректа браузерами и nginx, в секундах.
+SHORT_LINK_MAX_AGE = 60 * 5
+
+# Кэш отрендеренных PDF со списком покупок.
+SHOPPING_LIST_PDF_CACHE = {
+    'BACKEND': os.getenv('SHOPPING_LIST_PDF_CACHE_BACKEND'),
+    'MAX_SIZE': 128,
+    'TIMEOUT': 60 * 60,
+}
+
+# Число версий справочников, ответы которых держатся в памяти.
+CATALOG_CACHE_SIZE = 8
+
+# Индекс автодополнения ингредиентов: время жизни в секундах
+# (страхует от изменений в обход сигналов) и предел выдачи.
+INGREDIENT_INDEX = {
+    'TIMEOUT': int(os.getenv('INGREDIENT_INDEX_TIMEOUT', 300)),
+    'LIMIT': 50,
+}
+
+# Общее количество объектов в постраничной выдаче кэшируется на TTL,
+# если оно не меньше MIN_COUNT: малые выборки считаются точно.
+PAGINATION_COUNT_CACHE = {
+    'MAX_SIZE': 512,
+    'MIN_COUNT': int(os.getenv('PAGINATION_COUNT_MIN', 1000)),
+    'TIMEOUT': int(os.getenv('PAGINATION_COUNT_TIMEOUT', 60)),
+}
+
+# Предел размера загружаемой картинки. JSON с картинкой в base64
+# примерно на треть больше самого файла.
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv('IMAGE_UPLOAD_MAX_SIZE', 5 * 1024 * 1024))
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_UPLOAD_MAX_SIZE * 4 // 3 + 256 * 1024
+
+# Лента подписок: длина ленты каждого пользователя и порог подписчиков,
+# после которого раскладка нового рецепта уходит в фоновую задачу.
+FEED = {
+    'MAX_LENGTH': 500,
+    'FANOUT_INLINE_LIMIT': 200,
+    'FANOUT_BATCH_SIZE': 1000,
+}
+
+# Качество уменьшенных копий картинок рецептов и аватаров.
+IMAGE_PROCESSING = {
+    'QUALITY': 82,
+}
+
+# Очередь фоновых задач (manage.py run_worker). Задача, которую
+# обработчик не продлевал VISIBILITY_TIMEOUT секунд, выдаётся снова;
+# повторы после ошибки откладываются на RETRY_DELAY * 2^n секунд.
+JOBS = {
+    'WORKERS': int(os.getenv('JOB_WORKERS', 2)),
+    'POLL_INTERVAL': 1,
+    'VISIBILITY_TIMEOUT': 300,
+    'RETRY_DELAY': 30,
+}
+
+# Метрики запросов для Prometheus (/metrics). Воркеры gunicorn
+# сбрасывают свои метрики в DIR не чаще FLUSH_INTERVAL секунд;
+# без DIR /metrics показывает только обработавший его процесс.
+# С TOKEN доступ по заголовку Authorization: Bearer <TOKEN>,
+# без него — только с адресов ALLOWED_IPS.
+MONITORING = {
+    'DIR': os.getenv('METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.getenv('METRICS_TOKEN'),
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+}
+
+# Профили запросов сотрудников (X-Profile: 1 или ?_profile=1):
+# в DIR хранятся MAX_REPORTS последних, старые удаляются.
+PROFILING = {
+    'DIR': os.getenv('PROFILE_DIR', str(BASE_DIR / 'profiles')),
+    'MAX_REPORTS': 50,
+    'STATS_LINES': 60,
+}
+
 AUTH_USER_MODEL = 'users.User'
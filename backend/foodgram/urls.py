@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
+
+from monitoring.views import metrics_view
 # from django.views.generic import TemplateView
 
 # from django.conf import settings
@@ -8,7 +10,9 @@ from django.urls import path, include
 urlpatterns = [
     path('api/', include('api.urls')),
     path('s/', include('recipes.urls')),
+    path('admin/profiles/', include('monitoring.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     # path(
     #     'redoc/',
     #     TemplateView.as_view(template_name='redoc.html'),
@@ -0,0 +1,18 @@
+import os
+
+
+def child_exit(server, worker):
+    """Удаляет снимок метрик завершившегося воркера.
+
+    Имя файла то же, что в monitoring.metrics.snapshot_path; Django
+    в мастер-процессе не загружается, поэтому путь собирается здесь.
+    """
+    directory = os.getenv('METRICS_DIR')
+    if not directory:
+        return
+    path = os.path.join(directory, f'metrics-{worker.pid}.json')
+    for name in (path, f'{path}.tmp'):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
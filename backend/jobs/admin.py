@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'args', 'status', 'priority', 'attempts',
+                    'run_after', 'locked_by')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error', 'created_at')
+    actions = ('retry',)
+
+    @admin.action(description='Перезапустить')
+    def retry(self, request, queryset):
+        queryset.update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(),
+            locked_until=None, locked_by='',
+        )
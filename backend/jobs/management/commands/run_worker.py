@@ -0,0 +1,33 @@
+import signal
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Обработка очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS['WORKERS'],
+            help='Число процессов-исполнителей',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOBS['POLL_INTERVAL'],
+            help='Пауза между опросами пустой очереди, секунд',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(options['workers'], options['poll_interval'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {worker.done}, с ошибкой: {worker.failed}'))
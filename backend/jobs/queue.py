@@ -0,0 +1,127 @@
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+registry = {}
+
+
+def task(priority=0, max_attempts=3):
+    """Регистрирует функцию как фоновую задачу.
+
+    У функции появляется метод enqueue(*args); аргументы
+    должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        registry[name] = func
+
+        def delay(*args, **options):
+            options.setdefault('priority', priority)
+            options.setdefault('max_attempts', max_attempts)
+            return enqueue(name, *args, **options)
+
+        func.task_name = name
+        func.enqueue = delay
+        return func
+    return decorator
+
+
+def enqueue(name, *args, priority=0, max_attempts=3, delay=None):
+    """Ставит задачу в очередь.
+
+    Запись создаётся в текущей транзакции, поэтому воркер увидит
+    задачу только вместе с данными, ради которых она поставлена.
+    """
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+
+
+def get_task(name):
+    if name not in registry:
+        import_module(name.rsplit('.', 1)[0])
+    try:
+        return registry[name]
+    except KeyError:
+        raise LookupError(f'Неизвестная задача {name}')
+
+
+def execute(name, args):
+    """Выполняет задачу в процессе пула."""
+    close_old_connections()
+    try:
+        get_task(name)(*args)
+    finally:
+        close_old_connections()
+
+
+def visibility_deadline():
+    return timezone.now() + timedelta(
+        seconds=settings.JOBS['VISIBILITY_TIMEOUT'])
+
+
+def claim(worker, limit):
+    """Забирает до limit готовых задач.
+
+    Задачи, чей обработчик не продлил занятость за время
+    VISIBILITY_TIMEOUT, считаются брошенными и выдаются снова.
+    """
+    now = timezone.now()
+    expired = Q(status=Job.RUNNING, locked_until__lt=now)
+    Job.objects.filter(
+        expired, attempts__gte=F('max_attempts')
+    ).update(status=Job.FAILED, last_error='Превышено время выполнения.')
+    with transaction.atomic():
+        ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.QUEUED, run_after__lte=now) | expired
+        ).order_by('-priority', 'run_after', 'id').values_list(
+            'id', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=visibility_deadline(),
+            locked_by=worker,
+        )
+    jobs = Job.objects.in_bulk(ids)
+    return [jobs[pk] for pk in ids]
+
+
+def extend(worker, ids):
+    """Продлевает занятость выполняющихся задач."""
+    if ids:
+        Job.objects.filter(pk__in=ids, locked_by=worker).update(
+            locked_until=visibility_deadline())
+
+
+def complete(job):
+    Job.objects.filter(pk=job.pk).delete()
+
+
+def fail(job, error):
+    """Откладывает повтор с растущей паузой или помечает задачу упавшей."""
+    last_error = ''.join(traceback.format_exception(
+        type(error), error, error.__traceback__))
+    if job.attempts >= job.max_attempts:
+        changes = {'status': Job.FAILED}
+    else:
+        changes = {
+            'status': Job.QUEUED,
+            'run_after': timezone.now() + timedelta(
+                seconds=settings.JOBS['RETRY_DELAY']
+                * 2 ** (job.attempts - 1)),
+        }
+    Job.objects.filter(pk=job.pk).update(
+        locked_until=None, locked_by='', last_error=last_error, **changes)
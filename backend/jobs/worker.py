@@ -0,0 +1,90 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.db import close_old_connections
+
+from . import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Разбирает очередь задач пулом процессов.
+
+    Основной процесс только забирает задачи и отмечает результат,
+    сами задачи выполняются в дочерних процессах.
+    """
+
+    def __init__(self, workers, poll_interval):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.running = {}
+        self.stopping = False
+        self.done = self.failed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def create_pool(self):
+        return ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+
+    def run(self, once=False):
+        """Работает до остановки, а с once — пока есть готовые задачи."""
+        pool = self.create_pool()
+        try:
+            while True:
+                close_old_connections()
+                claimed = []
+                free = self.workers - len(self.running)
+                if not self.stopping and free:
+                    claimed = queue.claim(self.name, free)
+                    for job in claimed:
+                        future = pool.submit(queue.execute, job.name, job.args)
+                        self.running[future] = job
+                if not self.running:
+                    if self.stopping or once:
+                        break
+                    self.sleep()
+                    continue
+                done, _ = wait(
+                    self.running, self.poll_interval, FIRST_COMPLETED)
+                if self.collect(done):
+                    # Упавший процесс ломает весь пул, остальные задачи
+                    # завершаются той же ошибкой и уходят на повтор.
+                    self.collect(wait(self.running).done)
+                    pool.shutdown(wait=False)
+                    pool = self.create_pool()
+                queue.extend(
+                    self.name, [job.pk for job in self.running.values()])
+        finally:
+            pool.shutdown(wait=True)
+
+    def collect(self, futures):
+        """Отмечает результаты; True, если пул процессов сломан."""
+        broken = False
+        for future in futures:
+            job = self.running.pop(future)
+            error = future.exception()
+            if error is None:
+                queue.complete(job)
+                self.done += 1
+                continue
+            broken = broken or isinstance(error, BrokenProcessPool)
+            logger.error('Задача %s завершилась ошибкой: %r', job, error)
+            queue.fail(job, error)
+            self.failed += 1
+        return broken
+
+    def sleep(self):
+        time.sleep(self.poll_interval)
@@ -0,0 +1,204 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+INF = float('inf')
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками, потокобезопасная.
+
+    Для каждого набора меток хранятся попадания в корзины
+    (не накопленные), сумма и число наблюдений.
+    """
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = (*buckets, INF)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * len(self.buckets) + [0, 0]
+            row[bisect_left(self.buckets, value)] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[*labels, list(row)] for labels, row in
+                    self.values.items()]
+
+    def render(self, rows):
+        """Строки текстового формата Prometheus."""
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, row in sorted(rows.items()):
+            pairs = [
+                f'{name}="{escape(value)}"'
+                for name, value in zip(self.labels, labels)
+            ]
+            total = 0
+            for bound, hits in zip(self.buckets, row):
+                total += hits
+                le = '+Inf' if bound == INF else repr(float(bound))
+                yield self.sample('_bucket', [*pairs, f'le="{le}"'], total)
+            yield self.sample('_sum', pairs, row[-2])
+            yield self.sample('_count', pairs, row[-1])
+
+    def sample(self, suffix, pairs, value):
+        return f'{self.name}{suffix}{{{",".join(pairs)}}} {value}'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+VIEW_LABELS = ('view', 'method', 'status')
+
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса до отдачи ответа.',
+    VIEW_LABELS,
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    'foodgram_http_request_db_queries',
+    'Число SQL-запросов за запрос.',
+    VIEW_LABELS,
+    (0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_DURATION = Histogram(
+    'foodgram_http_request_db_duration_seconds',
+    'Суммарное время SQL-запросов за запрос.',
+    VIEW_LABELS,
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+SERIALIZE_DURATION = Histogram(
+    'foodgram_http_request_serialize_duration_seconds',
+    'Время сериализации и рендеринга ответа без SQL.',
+    VIEW_LABELS,
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_http_response_size_bytes',
+    'Размер тела ответа.',
+    VIEW_LABELS,
+    (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+METRICS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZE_DURATION,
+           RESPONSE_SIZE)
+
+_flushed = 0
+_flush_lock = threading.Lock()
+
+
+def snapshot_path(pid=None):
+    return os.path.join(
+        settings.MONITORING['DIR'], f'metrics-{pid or os.getpid()}.json')
+
+
+def flush(force=False):
+    """Сохраняет метрики процесса в MONITORING['DIR'].
+
+    Воркеры gunicorn пишут каждый свой файл не чаще FLUSH_INTERVAL,
+    /metrics складывает их, в каком бы воркере ни выполнился.
+    """
+    global _flushed
+    if not settings.MONITORING['DIR']:
+        return
+    now = time.monotonic()
+    with _flush_lock:
+        if not force and now - _flushed < settings.MONITORING[
+                'FLUSH_INTERVAL']:
+            return
+        _flushed = now
+    os.makedirs(settings.MONITORING['DIR'], exist_ok=True)
+    path = snapshot_path()
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump({metric.name: metric.snapshot() for metric in METRICS},
+                  file)
+    os.replace(f'{path}.tmp', path)
+
+
+atexit.register(flush, force=True)
+
+
+def snapshot_pid(path):
+    try:
+        return int(os.path.basename(path)[len('metrics-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_snapshot(path):
+    for name in (path, f'{path}.tmp'):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def collect():
+    """Метрики всех процессов: свои — живые, чужие — из снимков.
+
+    Снимки завершившихся процессов удаляются, чтобы их итоги не
+    копились в /metrics; Prometheus воспримет это как сброс счётчика.
+    """
+    merged = {metric.name: {} for metric in METRICS}
+    snapshots = [
+        {metric.name: metric.snapshot() for metric in METRICS}
+    ]
+    if settings.MONITORING['DIR']:
+        own = snapshot_path()
+        for path in glob.glob(snapshot_path('*')):
+            if path == own:
+                continue
+            pid = snapshot_pid(path)
+            if pid is not None and not is_alive(pid):
+                remove_snapshot(path)
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+    for snapshot in snapshots:
+        for name, rows in snapshot.items():
+            if name not in merged:
+                continue
+            for *labels, row in rows:
+                total = merged[name].setdefault(tuple(labels), [0] * len(row))
+                for index, value in enumerate(row):
+                    total[index] += value
+    return merged
+
+
+def render():
+    merged = collect()
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(merged[metric.name]))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,178 @@
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from . import metrics, profiling
+
+_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Замеры одного запроса: SQL и участки вроде сериализации."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.timings = defaultdict(float)
+        self.section = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def start(self, name):
+        """Начинает участок; вложенные участки не считаются повторно."""
+        if self.section is not None:
+            return False
+        self.section = (name, time.perf_counter(), self.db_time)
+        return True
+
+    def stop(self):
+        """Время участка без SQL-запросов внутри него."""
+        name, started, db_time = self.section
+        self.timings[name] += (time.perf_counter() - started
+                               - (self.db_time - db_time))
+        self.section = None
+
+    @contextmanager
+    def measure(self, name):
+        started = self.start(name)
+        try:
+            yield
+        finally:
+            if started:
+                self.stop()
+
+
+@contextmanager
+def measure(name):
+    stats = _stats.get()
+    if stats is None:
+        yield
+        return
+    with stats.measure(name):
+        yield
+
+
+def instrument_serializers():
+    """Засекает время serializer.data у сериализаторов DRF.
+
+    Через BaseSerializer.data проходят и Serializer, и ListSerializer.
+    """
+    data = BaseSerializer.data.fget
+    if getattr(data, 'measured', False):
+        return
+
+    def measured_data(self):
+        with measure('serialize'):
+            return data(self)
+
+    measured_data.measured = True
+    BaseSerializer.data = property(measured_data)
+
+
+def view_name(view_func, method):
+    """Метка вида: RecipesViewSet.list, UserViewSet.subscriptions."""
+    view_class = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class MetricsMiddleware:
+    """Метрики запросов для /metrics и заголовок Server-Timing.
+
+    Заголовок получают только ответы пользователям из персонала.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        request.view_name = 'unmatched'
+        token = _stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+        duration = time.perf_counter() - started
+        labels = (request.view_name, request.method,
+                  str(response.status_code))
+        metrics.REQUEST_DURATION.observe(labels, duration)
+        metrics.DB_QUERIES.observe(labels, stats.queries)
+        metrics.DB_DURATION.observe(labels, stats.db_time)
+        metrics.SERIALIZE_DURATION.observe(labels, sum(
+            stats.timings.values()))
+        if response.streaming:
+            response.streaming_content = self.count_bytes(
+                response.streaming_content, labels)
+        else:
+            metrics.RESPONSE_SIZE.observe(labels, len(response.content))
+            metrics.flush()
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = server_timing(stats, duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_name = view_name(view_func, request.method.lower())
+
+    def process_template_response(self, request, response):
+        """Рендеринг ответа DRF идёт после вида, засекаем его отдельно."""
+        stats = _stats.get()
+        if stats is not None and stats.start('render'):
+            response.add_post_render_callback(
+                lambda response: stats.stop())
+        return response
+
+    def count_bytes(self, content, labels):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.RESPONSE_SIZE.observe(labels, size)
+            metrics.flush()
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос сотрудника с заголовком X-Profile или ?_profile.
+
+    Остальные запросы проходят без обёрток; стоит после
+    AuthenticationMiddleware, чтобы видеть пользователя сессии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling.requested(request) and profiling.is_staff(request):
+            return profiling.profile(request, self.get_response)
+        return self.get_response(request)
+
+
+def server_timing(stats, duration):
+    parts = [f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} SQL"']
+    parts.extend(
+        f'{name};dur={value * 1000:.1f}'
+        for name, value in stats.timings.items()
+    )
+    parts.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(parts)
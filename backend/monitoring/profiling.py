@@ -0,0 +1,193 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+HEADER = 'X-Profile'
+QUERY_FLAG = '_profile'
+MONITORING_DIR = os.path.dirname(os.path.abspath(__file__))
+STACK_DEPTH = 8
+SQL_LENGTH = 2000
+
+
+def requested(request):
+    """Флаг профилирования в заголовке или параметре запроса."""
+    return HEADER in request.headers or QUERY_FLAG in request.GET
+
+
+def is_staff(request):
+    """Сотрудник по сессии или по аутентификации API.
+
+    Вызывается только для запросов с флагом, остальные
+    аутентифицируются как обычно, в виде.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    api_request = Request(request)
+    for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication().authenticate(api_request)
+        except AuthenticationFailed:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
+
+
+def is_project_frame(frame):
+    path = os.path.abspath(frame.filename)
+    return (path.startswith(str(settings.BASE_DIR))
+            and 'site-packages' not in path)
+
+
+def frame_label(frame):
+    path = frame.filename
+    if 'site-packages' in path:
+        path = path.split('site-packages' + os.sep, 1)[1]
+    else:
+        path = os.path.relpath(path, settings.BASE_DIR)
+    return f'{path}:{frame.lineno} in {frame.name}'
+
+
+def query_stack():
+    """Вызовы из кода проекта, приведшие к запросу.
+
+    Если запрос целиком из библиотек (например, аутентификация DRF),
+    место вызова — ближайший кадр вне ORM.
+    """
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if not os.path.abspath(frame.filename).startswith(MONITORING_DIR)
+    ]
+    stack = [frame for frame in frames if is_project_frame(frame)]
+    if not stack:
+        stack = [
+            frame for frame in frames
+            if f'django{os.sep}db{os.sep}' not in frame.filename
+        ][-1:]
+    return [frame_label(frame) for frame in stack[-STACK_DEPTH:]]
+
+
+class QueryCapture:
+    """Обёртка execute_wrapper: SQL, время и место вызова в коде проекта."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            stack = query_stack()
+            self.queries.append({
+                'sql': sql[:SQL_LENGTH],
+                'params': repr(params)[:SQL_LENGTH],
+                'duration_ms': round(duration * 1000, 3),
+                'origin': stack[-1] if stack else '',
+                'stack': stack,
+            })
+
+
+def profile(request, get_response):
+    """Выполняет запрос под cProfile и сохраняет отчёт."""
+    capture = QueryCapture()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(capture))
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - started
+    report_id = save_report(request, response, duration, profiler, capture)
+    response['X-Profile-Id'] = report_id
+    return response
+
+
+def stats_text(profiler):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(
+        'cumulative').print_stats(settings.PROFILING['STATS_LINES'])
+    return stream.getvalue()
+
+
+def save_report(request, response, duration, profiler, capture):
+    """Пишет отчёт <id>.json и дамп <id>.prof для pstats/snakeviz."""
+    directory = settings.PROFILING['DIR']
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.now()
+    report_id = f'{now:%Y%m%dT%H%M%S}-{now.microsecond:06d}-{os.getpid()}'
+    by_origin = Counter(query['origin'] for query in capture.queries)
+    report = {
+        'id': report_id,
+        'created': now.isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': getattr(request, 'view_name', ''),
+        'user': str(getattr(request, 'user', '')),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'queries_count': len(capture.queries),
+        'db_ms': round(sum(
+            query['duration_ms'] for query in capture.queries), 3),
+        'queries_by_origin': by_origin.most_common(),
+        'queries': capture.queries,
+        'profile': stats_text(profiler),
+    }
+    profiler.dump_stats(report_file(report_id, 'prof'))
+    path = report_file(report_id, 'json')
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=1)
+    os.replace(f'{path}.tmp', path)
+    trim()
+    return report_id
+
+
+def report_file(report_id, extension):
+    return os.path.join(settings.PROFILING['DIR'],
+                        f'{report_id}.{extension}')
+
+
+def report_ids():
+    """id отчётов, новые первыми."""
+    try:
+        names = os.listdir(settings.PROFILING['DIR'])
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (name[:-len('.json')] for name in names if name.endswith('.json')),
+        reverse=True,
+    )
+
+
+def trim():
+    """Кольцевой буфер: остаются MAX_REPORTS последних отчётов."""
+    for report_id in report_ids()[settings.PROFILING['MAX_REPORTS']:]:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(report_file(report_id, extension))
+            except FileNotFoundError:
+                pass
+
+
+def load_report(report_id):
+    with open(report_file(report_id, 'json'), encoding='utf-8') as file:
+        return json.load(file)
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from django.urls import path, re_path
+
+from .views import profile_download, profile_list
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('', admin.site.admin_view(profile_list), name='profiles'),
+    re_path(
+        r'^(?P<report_id>[\dT-]+)\.(?P<extension>json|prof)$',
+        admin.site.admin_view(profile_download),
+        name='profile_download',
+    ),
+]
@@ -0,0 +1,56 @@
+import os
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404, HttpResponse
+from django.http import HttpResponseForbidden
+from django.template.response import TemplateResponse
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
+from .profiling import load_report, report_file, report_ids
+
+REPORT_FIELDS = ('id', 'created', 'method', 'path', 'view', 'user',
+                 'status', 'duration_ms', 'queries_count', 'db_ms')
+
+
+def has_access(request):
+    """Токен из MONITORING['TOKEN'] или запрос с разрешённого адреса."""
+    token = settings.MONITORING['TOKEN']
+    if token:
+        return constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}')
+    return request.META.get('REMOTE_ADDR') in settings.MONITORING[
+        'ALLOWED_IPS']
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    if not has_access(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4')
+
+
+def profile_list(request):
+    """Сохранённые профили запросов, новые первыми."""
+    reports = []
+    for report_id in report_ids():
+        try:
+            report = load_report(report_id)
+        except (OSError, ValueError):
+            continue
+        reports.append({field: report.get(field) for field in REPORT_FIELDS})
+    return TemplateResponse(request, 'monitoring/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'reports': reports,
+    })
+
+
+def profile_download(request, report_id, extension):
+    path = report_file(report_id, extension)
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True,
+                        filename=os.path.basename(path))
@@ -14,7 +14,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @display(description='Количество в избранных')
     def added_in_favorite(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
 
 class IngredientsAdmin(admin.ModelAdmin):
@@ -22,9 +22,47 @@ class IngredientsAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Просмотр связей, которые меняются только через API.
+
+    Вместе с ними API обновляет производные данные (агрегат корзины,
+    счётчики, ленты), а прямые правки в админке их бы рассогласовали.
+    """
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Каскадное удаление вместе с рецептом или пользователем
+        # отрабатывают сигналы, запрещены только прямые удаления.
+        opts = self.model._meta
+        url_name = getattr(request.resolver_match, 'url_name', None) or ''
+        if url_name.startswith(f'{opts.app_label}_{opts.model_name}_'):
+            return False
+        return super().has_delete_permission(request, obj)
+
+
+class IngredientsInRecipeAdmin(ReadOnlyAdmin):
+    list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+
+
+class BasketAdmin(ReadOnlyAdmin):
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+
+
+class FavoriteAdmin(ReadOnlyAdmin):
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+
+
 admin.site.register(Tag)
 admin.site.register(Ingredients, IngredientsAdmin)
 admin.site.register(Recipes, RecipeAdmin)
-admin.site.register(IngredientsInRecipe)
-admin.site.register(Basket)
-admin.site.register(Favorite)
+admin.site.register(IngredientsInRecipe, IngredientsInRecipeAdmin)
+admin.site.register(Basket, BasketAdmin)
+admin.site.register(Favorite, FavoriteAdmin)
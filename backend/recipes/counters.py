@@ -0,0 +1,65 @@
+from django.apps import apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class CountersMixin:
+    """Модель со счётчиками, которые меняются только через F().
+
+    Обычное save() существующей записи не пишет счётчики, иначе оно
+    затёрло бы прочитанным ранее значением параллельные приращения.
+    Отложенные поля тоже не пишутся: их пришлось бы сначала загрузить,
+    а записали бы их уже устаревшими.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно изменяет счётчик в БД выражением F."""
+    queryset.update(**{field: F(field) + delta})
+
+
+def counter_sources(get_model):
+    """Счётчики и связи, по которым они считаются."""
+    recipes = get_model('recipes', 'Recipes')
+    user = get_model('users', 'User')
+    return (
+        (recipes, 'favorites_count', get_model('recipes', 'Favorite'),
+         'recipe'),
+        (recipes, 'shopping_cart_count', get_model('recipes', 'Basket'),
+         'recipe'),
+        (user, 'recipes_count', recipes, 'author'),
+        (user, 'subscribers_count', get_model('users', 'UserSubscribers'),
+         'subscriber'),
+    )
+
+
+def recount(get_model=apps.get_model):
+    """Пересчитывает счётчики, возвращает число исправленных строк."""
+    repaired = {}
+    for model, field, source, relation in counter_sources(get_model):
+        actual = Coalesce(Subquery(
+            source.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)
+        repaired[f'{model.__name__}.{field}'] = model.objects.annotate(
+            actual=actual
+        ).exclude(**{field: F('actual')}).update(**{field: actual})
+    return repaired
@@ -0,0 +1,251 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from users.models import User, UserSubscribers
+from . import feed, shopping_cart, short_links
+from .counters import recount
+from .loaders import CSVStream, batches
+from .models import (Basket, Favorite, Ingredients, IngredientsInRecipe,
+                     Recipes, Tag)
+from .search import update_search_vector
+
+PASSWORD = 'foodgram-dataset'
+EMAIL_DOMAIN = 'dataset.foodgram'
+BATCH_SIZE = 5000
+# Рецепты и пользователи равномерно распределены по этому периоду.
+HISTORY = timedelta(days=3 * 365)
+# Самые частые ингредиенты; остальной справочник идёт за ними.
+STAPLES = (
+    'соль', 'сахар', 'яйца куриные', 'пшеничная мука', 'вода',
+    'сливочное масло', 'растительное масло', 'лук репчатый', 'чеснок',
+    'молоко', 'перец черный молотый', 'морковь', 'картофель', 'сметана',
+    'оливковое масло', 'помидоры',
+)
+# Показатели степенного закона: вес элемента — 1 / rank ** skew.
+INGREDIENT_SKEW = 1.0
+AUTHOR_SKEW = 1.1
+RECIPE_SKEW = 0.9
+# Сколько тегов у рецепта: 1, 2 или 3 с такими весами.
+TAG_COUNT_WEIGHTS = (6, 3, 1)
+AMOUNTS = (1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 500)
+FIRST_NAMES = ('Анна', 'Иван', 'Ольга', 'Пётр', 'Мария', 'Сергей')
+LAST_NAMES = ('Иванова', 'Петров', 'Сидорова', 'Смирнов', 'Кузнецова')
+
+
+class PowerLaw:
+    """Случайный выбор, при котором немногие элементы популярны.
+
+    Элементы упорядочены по убыванию популярности.
+    """
+
+    def __init__(self, items, skew, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(items) + 1)))
+
+    def choice(self):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def sample(self, count, exclude=None):
+        """До count разных элементов, кроме exclude."""
+        count = min(count, len(self.items) - (exclude is not None))
+        chosen = {}
+        while len(chosen) < count:
+            for item in self.rng.choices(
+                    self.items, cum_weights=self.cum_weights,
+                    k=count - len(chosen)):
+                if item != exclude:
+                    chosen[item] = None
+        return list(chosen)[:count]
+
+
+def load_catalog():
+    """Теги и ингредиенты из справочников проекта."""
+    call_command('load_tags', stdout=io.StringIO())
+    call_command('load_ingredients', stdout=io.StringIO())
+
+
+def catalog_ingredients(rng):
+    """id ингредиентов: сначала основные продукты, затем остальные."""
+    ids = dict(Ingredients.objects.values_list('name', 'id'))
+    staples = [ids.pop(name) for name in STAPLES if name in ids]
+    rest = sorted(ids.values())
+    rng.shuffle(rest)
+    return staples + rest
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def reset_sequences(*models):
+    """После вставки с явными id последовательности надо сдвинуть."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def insert(model, objects, use_copy):
+    """Пачка объектов через bulk_create или COPY (только PostgreSQL)."""
+    if not use_copy:
+        model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        return
+    if not objects:
+        return
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objects[0].pk is None)
+    ]
+    rows = (
+        [
+            '\\N' if value is None else value
+            for value in (
+                field.get_db_prep_save(getattr(obj, field.attname),
+                                       connection)
+                for field in fields
+            )
+        ]
+        for obj in objects
+    )
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} '
+            f'({", ".join(quote(field.column) for field in fields)}) '
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            CSVStream(rows)
+        )
+
+
+def create_users(count, rng, use_copy):
+    password = make_password(PASSWORD)
+    first = next_id(User)
+    now = timezone.now()
+    for ids in batches(range(first, first + count), BATCH_SIZE):
+        insert(User, [
+            User(
+                pk=pk,
+                email=f'user{pk}@{EMAIL_DOMAIN}',
+                username=f'user{pk}',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=now - HISTORY * rng.random(),
+            )
+            for pk in ids
+        ], use_copy)
+    reset_sequences(User)
+    return list(range(first, first + count))
+
+
+def cooking_time(rng):
+    """Обычно полчаса, изредка несколько часов."""
+    return max(1, min(round(rng.lognormvariate(3.4, 0.6)), 600))
+
+
+def create_recipes(authors, count, rng, use_copy):
+    """Рецепты с тегами и ингредиентами пачками по BATCH_SIZE.
+
+    Авторы и ингредиенты выбираются по степенному закону,
+    id и короткие ссылки назначаются заранее.
+    """
+    tags = sorted(Tag.objects.values_list('id', flat=True))
+    ingredients = PowerLaw(catalog_ingredients(rng), INGREDIENT_SKEW, rng)
+    first = next_id(Recipes)
+    step = HISTORY / max(count, 1)
+    now = timezone.now()
+    for ids in batches(range(first, first + count), BATCH_SIZE):
+        recipes, tagged, amounts = [], [], []
+        for pk in ids:
+            pub_date = now - step * (first + count - pk)
+            recipes.append(Recipes(
+                pk=pk,
+                author_id=authors.choice(),
+                name=f'Рецепт {pk}',
+                text='Смешать и приготовить. ' * rng.randint(1, 10),
+                cooking_time=cooking_time(rng),
+                short_link=short_links.encode(pk),
+                pub_date=pub_date,
+                updated_at=pub_date,
+            ))
+            tag_count = rng.choices((1, 2, 3), weights=TAG_COUNT_WEIGHTS)[0]
+            tagged.extend(
+                Recipes.tags.through(recipes_id=pk, tag_id=tag)
+                for tag in rng.sample(tags, min(tag_count, len(tags)))
+            )
+            amounts.extend(
+                IngredientsInRecipe(
+                    recipe_id=pk, ingredient_id=ingredient,
+                    amount=rng.choice(AMOUNTS),
+                )
+                for ingredient in ingredients.sample(
+                    round(rng.triangular(3, 15, 6)))
+            )
+        insert(Recipes, recipes, use_copy)
+        insert(Recipes.tags.through, tagged, use_copy)
+        insert(IngredientsInRecipe, amounts, use_copy)
+        update_search_vector(list(ids))
+    reset_sequences(Recipes)
+    return list(range(first, first + count))
+
+
+def create_relations(users, authors, recipes, favorites, cart,
+                     subscriptions, rng, use_copy):
+    """Избранное, корзины и подписки; в среднем favorites, cart и
+    subscriptions на пользователя, популярным достаётся больше.
+    """
+    recipes = list(recipes)
+    rng.shuffle(recipes)
+    popular = PowerLaw(recipes, RECIPE_SKEW, rng)
+    for chunk in batches(users, 1000):
+        insert(Favorite, [
+            Favorite(user_id=user, recipe_id=recipe)
+            for user in chunk
+            for recipe in popular.sample(rng.randint(0, 2 * favorites))
+        ], use_copy)
+        insert(Basket, [
+            Basket(user_id=user, recipe_id=recipe)
+            for user in chunk
+            for recipe in popular.sample(rng.randint(0, 2 * cart))
+        ], use_copy)
+        insert(UserSubscribers, [
+            UserSubscribers(user_id=user, subscriber_id=author)
+            for user in chunk
+            for author in authors.sample(
+                rng.randint(0, 2 * subscriptions), exclude=user)
+        ], use_copy)
+
+
+@atomic
+def generate(users=20, recipes=100, favorites=10, cart=5,
+             subscriptions=5, seed=0, use_copy=False):
+    """Создаёт одинаковый при одном seed набор данных.
+
+    Списки покупок, счётчики и ленты пересчитываются после
+    массовой вставки, минуя сигналы.
+    """
+    rng = random.Random(seed)
+    load_catalog()
+    user_ids = create_users(users, rng, use_copy)
+    authors = list(user_ids)
+    rng.shuffle(authors)
+    authors = PowerLaw(authors, AUTHOR_SKEW, rng)
+    recipe_ids = create_recipes(authors, recipes, rng, use_copy)
+    create_relations(user_ids, authors, recipe_ids, favorites, cart,
+                     subscriptions, rng, use_copy)
+    for chunk in batches(user_ids, 1000):
+        shopping_cart.rebuild(chunk)
+        feed.rebuild(chunk)
+    recount()
+    return {'users': user_ids, 'recipes': recipe_ids}
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from jobs.queue import task
+from users.models import User, UserSubscribers
+from .models import FeedEntry, Recipes
+
+
+def feed_length():
+    return settings.FEED['MAX_LENGTH']
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей не больше MAX_LENGTH записей.
+
+    Одним запросом DELETE с ROW_NUMBER() по каждой ленте.
+    """
+    ranked = FeedEntry.objects.filter(user__in=user_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('user'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )
+    ).values('id', 'position')
+    try:
+        sql, params = ranked.query.sql_with_params()
+    except EmptyResultSet:
+        return
+    FeedEntry.objects.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) AS ranked '
+        f'WHERE ranked.position > %s',
+        (*params, feed_length())
+    )).delete()
+
+
+def add_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, ignore_conflicts=True, batch_size=1000)
+
+
+@task(priority=-1)
+def fan_out(recipe_id):
+    """Раскладывает рецепт по лентам подписчиков автора пачками.
+
+    Пачки идут по user_id: order_by('user') сортировал бы по
+    User.Meta.ordering, и курсор user_id__gt пропускал бы подписчиков.
+    """
+    recipe = Recipes.objects.filter(pk=recipe_id).values(
+        'author', 'pub_date').first()
+    if recipe is None:
+        return
+    followers = UserSubscribers.objects.filter(
+        subscriber=recipe['author']
+    ).order_by('user_id').values_list('user_id', flat=True)
+    batch_size = settings.FEED['FANOUT_BATCH_SIZE']
+    last = 0
+    while True:
+        batch = list(followers.filter(user_id__gt=last)[:batch_size])
+        if not batch:
+            break
+        add_entries([
+            FeedEntry(user_id=user, recipe_id=recipe_id,
+                      author_id=recipe['author'],
+                      pub_date=recipe['pub_date'])
+            for user in batch
+        ])
+        trim(batch)
+        last = batch[-1]
+
+
+def publish(recipe):
+    """Новый рецепт в ленты подписчиков.
+
+    Для авторов с большим числом подписчиков раскладка уходит
+    в очередь фоновых задач.
+    """
+    followers = User.objects.filter(pk=recipe.author_id).values_list(
+        'subscribers_count', flat=True).first() or 0
+    if not followers:
+        return
+    if followers > settings.FEED['FANOUT_INLINE_LIMIT']:
+        fan_out.enqueue(recipe.pk)
+    else:
+        fan_out(recipe.pk)
+
+
+def follow(user_id, author_ids):
+    """Добавляет в ленту последние рецепты новых авторов."""
+    if not author_ids:
+        return
+    recipes = Recipes.objects.filter(author__in=author_ids).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'author', 'pub_date')[:feed_length()]
+    add_entries([
+        FeedEntry(user_id=user_id, recipe_id=recipe, author_id=author,
+                  pub_date=pub_date)
+        for recipe, author, pub_date in recipes
+    ])
+    trim([user_id])
+
+
+def unfollow(user_id, author_ids):
+    if author_ids:
+        FeedEntry.objects.filter(
+            user=user_id, author__in=author_ids).delete()
+
+
+def fill(user_ids):
+    """Заполняет пустые ленты пользователей одним INSERT ... SELECT.
+
+    Берутся последние MAX_LENGTH рецептов каждого автора из подписок,
+    затем не больше MAX_LENGTH на ленту по ROW_NUMBER() читателя.
+    """
+    subscriptions = UserSubscribers.objects.filter(user__in=user_ids)
+    latest = Recipes.objects.filter(
+        author__in=subscriptions.values('subscriber')
+    ).latest_per_author(feed_length())
+    ranked = subscriptions.filter(
+        subscriber__author_recipe__in=latest
+    ).annotate(
+        feed_user=F('user'),
+        feed_recipe=F('subscriber__author_recipe'),
+        feed_author=F('subscriber'),
+        feed_pub_date=F('subscriber__author_recipe__pub_date'),
+        position=Window(
+            RowNumber(),
+            partition_by=F('user'),
+            order_by=(F('subscriber__author_recipe__pub_date').desc(),
+                      F('subscriber__author_recipe__id').desc()),
+        ),
+    ).values('feed_user', 'feed_recipe', 'feed_author', 'feed_pub_date',
+             'position')
+    try:
+        sql, params = ranked.query.sql_with_params()
+    except EmptyResultSet:
+        return
+    table = connection.ops.quote_name(FeedEntry._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, recipe_id, author_id, pub_date) '
+            f'SELECT ranked.feed_user, ranked.feed_recipe, '
+            f'ranked.feed_author, ranked.feed_pub_date '
+            f'FROM ({sql}) AS ranked WHERE ranked.position <= %s',
+            (*params, feed_length())
+        )
+
+
+def rebuild(user_ids=None):
+    """Собирает ленты заново по подпискам, пачками читателей."""
+    readers = User.objects.filter(owner__isnull=False).distinct()
+    if user_ids is not None:
+        readers = readers.filter(pk__in=user_ids)
+        FeedEntry.objects.filter(user__in=user_ids).delete()
+    else:
+        FeedEntry.objects.all().delete()
+    readers = readers.order_by('pk').values_list('pk', flat=True)
+    batch_size = settings.FEED['FANOUT_BATCH_SIZE']
+    last = 0
+    while True:
+        batch = list(readers.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            break
+        fill(batch)
+        last = batch[-1]
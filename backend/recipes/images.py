@@ -0,0 +1,131 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from jobs.queue import task
+from users.models import User
+from .models import Recipes
+
+# Поле варианта: (размер, обрезать ли до точного размера).
+RECIPE_VARIANTS = {
+    'image_card': ((600, 400), True),
+    'image_detail': ((1280, 960), False),
+}
+AVATAR_VARIANTS = {
+    'avatar_small': ((128, 128), True),
+}
+
+
+def variant_name(source_name, field):
+    """Имя файла варианта однозначно выводится из имени оригинала."""
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}_{field}.jpg')
+
+
+def is_current(instance, source, field):
+    """Построен ли вариант из текущего оригинала."""
+    original = getattr(instance, source)
+    return bool(original) and (
+        getattr(instance, field).name == variant_name(original.name, field))
+
+
+def current_variant(instance, source, field):
+    """Готовый вариант изображения, пока его нет — оригинал."""
+    if is_current(instance, source, field):
+        return getattr(instance, field)
+    return getattr(instance, source)
+
+
+def needs_processing(instance, source, variants):
+    if getattr(instance, source):
+        return not all(
+            is_current(instance, source, field) for field in variants)
+    return any(getattr(instance, field) for field in variants)
+
+
+def render(image, size, crop):
+    """Перекодирует изображение в JPEG без метаданных."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    if crop:
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(
+        buffer, 'JPEG', optimize=True, progressive=True,
+        quality=settings.IMAGE_PROCESSING['QUALITY'],
+    )
+    return buffer.getvalue()
+
+
+def build_variants(model, pk, source, variants, **changes):
+    """Строит недостающие варианты и записывает их в модель.
+
+    Запись выполняется, только если оригинал не сменился за время
+    обработки; иначе новые файлы удаляются.
+    """
+    instance = model.objects.filter(pk=pk).only(
+        'pk', source, *variants).first()
+    if instance is None or not needs_processing(instance, source, variants):
+        return False
+    original = getattr(instance, source)
+    stale = [
+        getattr(instance, field).name for field in variants
+        if getattr(instance, field)
+        and not is_current(instance, source, field)
+    ]
+    values = {}
+    if original:
+        with original.open('rb'):
+            image = ImageOps.exif_transpose(Image.open(original))
+            image.load()
+        for field, (size, crop) in variants.items():
+            if is_current(instance, source, field):
+                continue
+            storage = getattr(instance, field).storage
+            name = variant_name(original.name, field)
+            storage.delete(name)
+            values[field] = storage.save(
+                name, ContentFile(render(image, size, crop)))
+    else:
+        values = {field: '' for field in variants}
+    if original:
+        unchanged = Q(**{source: original.name})
+    else:
+        unchanged = Q(**{source: ''}) | Q(**{f'{source}__isnull': True})
+    updated = model.objects.filter(unchanged, pk=pk).update(
+        **values, **changes)
+    if not updated:
+        stale = [name for name in values.values() if name]
+    for name in stale:
+        original.storage.delete(name)
+    return bool(updated)
+
+
+@task()
+def process_recipe_images(recipe_id):
+    build_variants(
+        Recipes, recipe_id, 'image', RECIPE_VARIANTS,
+        updated_at=timezone.now(),
+    )
+
+
+@task()
+def process_avatar(user_id):
+    if build_variants(User, user_id, 'avatar', AVATAR_VARIANTS):
+        # Аватар автора входит в представление его рецептов.
+        Recipes.objects.filter(author=user_id).update(
+            updated_at=timezone.now())
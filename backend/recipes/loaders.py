@@ -0,0 +1,190 @@
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import connection
+
+from .constants import MAX_LENGTH_NAME_INGREDIENT, MAX_UNIT
+from .models import Ingredients
+from .search import is_postgresql
+
+FORMATS = ('csv', 'json')
+# С такого размера файла на PostgreSQL грузим через COPY.
+COPY_MIN_SIZE = 1024 * 1024
+
+
+def iter_csv(file):
+    return csv.DictReader(file)
+
+
+def iter_json(file, chunk_size=64 * 1024):
+    """Объекты JSON-массива или JSON Lines по одному.
+
+    Файл читается кусками, целиком в память не загружается.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer[:1] in ('[', ','):
+            buffer = buffer[1:]
+            continue
+        if buffer[:1] == ']':
+            return
+        if buffer:
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield row
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+READERS = {'csv': iter_csv, 'json': iter_json}
+
+
+def clean_rows(rows, stats):
+    """Пары (название, единица); пустые и слишком длинные пропускаются."""
+    for row in rows:
+        stats['read'] += 1
+        name = str(row.get('name') or '').strip()
+        unit = str(row.get('measurement_unit') or '').strip()
+        if (not name or not unit or len(name) > MAX_LENGTH_NAME_INGREDIENT
+                or len(unit) > MAX_UNIT):
+            continue
+        yield name, unit
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def sync_batch(batch, update, stats):
+    """Вставляет новые ингредиенты пачки и обновляет изменившиеся."""
+    units = dict(batch)
+    existing = {
+        name: (pk, unit) for pk, name, unit in Ingredients.objects.filter(
+            name__in=units).values_list('pk', 'name', 'measurement_unit')
+    }
+    new = [
+        Ingredients(name=name, measurement_unit=unit)
+        for name, unit in units.items() if name not in existing
+    ]
+    changed = [
+        Ingredients(pk=existing[name][0], name=name, measurement_unit=unit)
+        for name, unit in units.items()
+        if update and name in existing and existing[name][1] != unit
+    ]
+    Ingredients.objects.bulk_create(new, ignore_conflicts=True)
+    Ingredients.objects.bulk_update(changed, ('measurement_unit',))
+    stats['inserted'] += len(new)
+    stats['updated'] += len(changed)
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVStream:
+    """Файлоподобный поток CSV из пар значений для COPY FROM STDIN."""
+
+    def __init__(self, rows):
+        writer = csv.writer(Echo())
+        self.lines = (writer.writerow(row) for row in rows)
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def copy_rows(rows, update, stats):
+    """Загрузка через COPY во временную таблицу и один INSERT/UPDATE.
+
+    Только для PostgreSQL, внутри транзакции.
+    """
+    table = connection.ops.quote_name(Ingredients._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE ingredients_staging '
+            '(name text, measurement_unit text) ON COMMIT DROP'
+        )
+        cursor.copy_expert(
+            'COPY ingredients_staging (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            CSVStream(rows)
+        )
+        cursor.execute(f'''
+            WITH source AS (
+                SELECT DISTINCT ON (name) name, measurement_unit
+                FROM ingredients_staging
+                ORDER BY name
+            ), updated AS (
+                UPDATE {table} AS ingredient
+                SET measurement_unit = source.measurement_unit
+                FROM source
+                WHERE %s
+                    AND ingredient.name = source.name
+                    AND ingredient.measurement_unit
+                        <> source.measurement_unit
+                RETURNING 1
+            ), inserted AS (
+                INSERT INTO {table} (name, measurement_unit)
+                SELECT name, measurement_unit FROM source
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {table} AS ingredient
+                    WHERE ingredient.name = source.name
+                )
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM updated),
+                   (SELECT count(*) FROM inserted)
+        ''', [update])
+        updated, inserted = cursor.fetchone()
+    stats['updated'] += updated
+    stats['inserted'] += inserted
+
+
+def load_ingredients(file, format, update=False, batch_size=1000,
+                     use_copy=False):
+    """Идемпотентно загружает ингредиенты из потока CSV или JSON.
+
+    Ключ — название; при update у существующих ингредиентов
+    обновляется единица измерения, иначе они пропускаются.
+    Возвращает счётчики read, inserted, updated, skipped.
+    """
+    stats = Counter(read=0, inserted=0, updated=0)
+    rows = clean_rows(READERS[format](file), stats)
+    if use_copy and is_postgresql():
+        copy_rows(rows, update, stats)
+    else:
+        for batch in batches(rows, batch_size):
+            sync_batch(batch, update, stats)
+    stats['skipped'] = stats['read'] - stats['inserted'] - stats['updated']
+    return stats
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management import BaseCommand
+
+from api.cache import invalidate_all
+from recipes import dataset
+from recipes.search import is_postgresql
+
+
+class Command(BaseCommand):
+    help = ('Синтетический набор данных: пользователи, рецепты, избранное, '
+            'корзины и подписки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--favorites', type=int, default=10,
+            help='Рецептов в избранном у пользователя в среднем',
+        )
+        parser.add_argument(
+            '--shopping-cart', type=int, default=5,
+            help='Рецептов в корзине у пользователя в среднем',
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=5,
+            help='Подписок у пользователя в среднем',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--copy', choices=('auto', 'yes', 'no'), default='auto',
+            help='Вставка через COPY (только PostgreSQL); '
+                 'auto — если база PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        use_copy = is_postgresql() and options['copy'] != 'no'
+        started = time.monotonic()
+        created = dataset.generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            favorites=options['favorites'],
+            cart=options['shopping_cart'],
+            subscriptions=options['subscriptions'],
+            seed=options['seed'],
+            use_copy=use_copy,
+        )
+        invalidate_all()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей {len(created["users"])}, '
+            f'рецептов {len(created["recipes"])} за {elapsed:.1f} с'
+        ))
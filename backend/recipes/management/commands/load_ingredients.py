@@ -1,22 +1,66 @@
-import csv
+import os
+import time
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db.transaction import atomic
 
-from recipes.models import Ingredients
+from api.autocomplete import ingredient_index
+from api.cache import invalidate_all
+from recipes.loaders import COPY_MIN_SIZE, FORMATS, load_ingredients
 
 
 class Command(BaseCommand):
-    help = 'Загрузка из csv файла'
+    help = 'Загрузка ингредиентов из csv или json файла'
 
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f'{data_path}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            reader = csv.DictReader(file)
-            Ingredients.objects.bulk_create(
-                Ingredients(**data) for data in reader)
-        self.stdout.write(self.style.SUCCESS('Все ингридиенты загружены!'))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Файл с полями name и measurement_unit',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновлять единицы измерения существующих ингредиентов',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--copy', choices=('auto', 'yes', 'no'), default='auto',
+            help='Загрузка через COPY (только PostgreSQL); '
+                 'auto — для файлов от 1 МБ',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or os.path.splitext(path)[1][1:].lower()
+        if format == 'jsonl':
+            format = 'json'
+        if format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        use_copy = options['copy'] == 'yes' or (
+            options['copy'] == 'auto'
+            and os.path.getsize(path) >= COPY_MIN_SIZE
+        )
+        started = time.monotonic()
+        with open(path, encoding='utf-8') as file, atomic():
+            stats = load_ingredients(
+                file, format,
+                update=options['update'],
+                batch_size=options['batch_size'],
+                use_copy=use_copy,
+            )
+            if stats['inserted'] or stats['updated']:
+                invalidate_all()
+        if stats['inserted'] or stats['updated']:
+            ingredient_index.invalidate()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: прочитано {stats["read"]}, '
+            f'добавлено {stats["inserted"]}, обновлено {stats["updated"]}, '
+            f'пропущено {stats["skipped"]} за {elapsed:.2f} с '
+            f'({stats["read"] / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
@@ -1,15 +1,41 @@
 from django.core.management import BaseCommand
+from django.db.transaction import atomic
 
+from api.cache import invalidate_all
 from recipes.models import Tag
 
+TAGS = (
+    {'name': 'Завтрак', 'slug': 'breakfast'},
+    {'name': 'Обед', 'slug': 'dinner'},
+    {'name': 'Ужин', 'slug': 'supper'},
+)
+
 
 class Command(BaseCommand):
     help = 'Создаем тэги'
 
-    def handle(self, *args, **kwargs):
-        data = [
-            {'name': 'Завтрак', 'slug': 'breakfast'},
-            {'name': 'Обед', 'slug': 'dinner'},
-            {'name': 'Ужин', 'slug': 'supper'}]
-        Tag.objects.bulk_create(Tag(**tag) for tag in data)
-        self.stdout.write(self.style.SUCCESS('Все тэги загружены!'))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновлять названия существующих тегов',
+        )
+
+    @atomic
+    def handle(self, *args, **options):
+        existing = dict(Tag.objects.values_list('slug', 'name'))
+        new = [Tag(**tag) for tag in TAGS if tag['slug'] not in existing]
+        changed = [
+            tag for tag in TAGS
+            if options['update'] and tag['slug'] in existing
+            and existing[tag['slug']] != tag['name']
+        ]
+        Tag.objects.bulk_create(new, ignore_conflicts=True)
+        for tag in changed:
+            Tag.objects.filter(slug=tag['slug']).update(name=tag['name'])
+        if new or changed:
+            invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Теги загружены: добавлено {len(new)}, '
+            f'обновлено {len(changed)}, '
+            f'пропущено {len(TAGS) - len(new) - len(changed)}'
+        ))
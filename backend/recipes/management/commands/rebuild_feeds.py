@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+from django.db.transaction import atomic
+
+from recipes import feed
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок'
+
+    @atomic
+    def handle(self, *args, **kwargs):
+        feed.rebuild()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок собраны!'))
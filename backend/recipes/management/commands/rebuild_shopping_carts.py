@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+from django.db.transaction import atomic
+
+from recipes import shopping_cart
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт списков покупок по корзинам'
+
+    @atomic
+    def handle(self, *args, **kwargs):
+        shopping_cart.rebuild()
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересчитаны!'))
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+from django.db.transaction import atomic
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, корзин, рецептов и подписчиков'
+
+    @atomic
+    def handle(self, *args, **kwargs):
+        for counter, repaired in recount().items():
+            self.stdout.write(f'{counter}: исправлено {repaired}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны!'))
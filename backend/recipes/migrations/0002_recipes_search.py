@@ -0,0 +1,61 @@
+# Generated by Django 3.2.4 on 2026-10-18 04:28
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEXES = (
+    ('recipes_ingredients_name_upper_trgm', 'recipes_ingredients',
+     'UPPER(name::text) gin_trgm_ops'),
+    ('recipes_recipes_name_upper_trgm', 'recipes_recipes',
+     'UPPER(name::text) gin_trgm_ops'),
+    ('recipes_recipes_name_trgm', 'recipes_recipes', 'name gin_trgm_ops'),
+    ('recipes_recipes_search_vector', 'recipes_recipes', 'search_vector'),
+)
+
+FILL_SEARCH_VECTOR = """
+UPDATE recipes_recipes AS recipe SET search_vector =
+    setweight(to_tsvector('russian', recipe.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_ingredientsinrecipe AS amount
+        JOIN recipes_ingredients AS ingredient
+            ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} '
+            f'ON {table} USING gin ({expression})'
+        )
+    schema_editor.execute(FILL_SEARCH_VECTOR)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
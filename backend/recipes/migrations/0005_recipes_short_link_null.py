@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipes_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipes',
+            name='short_link',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True, verbose_name='Сокращенная ссылка'),
+        ),
+    ]
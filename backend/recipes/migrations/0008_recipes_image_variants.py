@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipes_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='image_card',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='dish/variants/', verbose_name='Картинка для карточки'),
+        ),
+        migrations.AddField(
+            model_name='recipes',
+            name='image_detail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='dish/variants/', verbose_name='Картинка для страницы рецепта'),
+        ),
+    ]
@@ -1,8 +1,13 @@
-import uuid
-
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import EmptyResultSet
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
+from . import short_links
+from .counters import CountersMixin
 from .constants import (MAX_LENGTH_NAME_RECIPE,
                         MAX_LENGTH_NAME_INGREDIENT, MAX_LENGTH_LINK,
                         MAX_UNIT, MAX_LENGTH_TAG, MIN_VALUE, MAX_VALUE)
@@ -51,7 +56,31 @@ class Ingredients(models.Model):
         return self.name
 
 
-class Recipes(models.Model):
+class RecipesQuerySet(models.QuerySet):
+
+    def latest_per_author(self, limit):
+        """Не более limit последних рецептов каждого автора.
+
+        Один запрос с ROW_NUMBER() OVER (PARTITION BY author)
+        вместо отдельного запроса на каждого автора.
+        """
+        ranked = self.order_by().annotate(author_position=Window(
+            RowNumber(),
+            partition_by=F('author'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )).values('id', 'author_position')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        return self.model.objects.filter(id__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) AS ranked '
+            f'WHERE ranked.author_position <= %s',
+            (*params, limit)
+        ))
+
+
+class Recipes(CountersMixin, models.Model):
     """Модель рецептов."""
 
     ingredients = models.ManyToManyField(
@@ -63,6 +92,14 @@ class Recipes(models.Model):
     image = models.ImageField(
         'Картинка', upload_to='dish/', blank=True, null=True,
     )
+    image_card = models.ImageField(
+        'Картинка для карточки', upload_to='dish/variants/',
+        blank=True, null=True, editable=False,
+    )
+    image_detail = models.ImageField(
+        'Картинка для страницы рецепта', upload_to='dish/variants/',
+        blank=True, null=True, editable=False,
+    )
     name = models.CharField('Название', max_length=MAX_LENGTH_NAME_RECIPE)
     text = models.TextField()
     cooking_time = models.PositiveSmallIntegerField(
@@ -74,17 +111,31 @@ class Recipes(models.Model):
     )
     short_link = models.CharField(
         'Сокращенная ссылка',
-        blank=True, unique=True, max_length=MAX_LENGTH_LINK,
-
+        blank=True, null=True, unique=True, max_length=MAX_LENGTH_LINK,
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата и время публикации рецепта', auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата и время изменения рецепта', auto_now=True
+    )
     author = models.ForeignKey(
         User, verbose_name='Автор рецепта',
         on_delete=models.CASCADE,
         related_name='author_recipe',
     )
+    favorites_count = models.PositiveIntegerField(
+        'Количество в избранном', default=0, editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'Количество в корзинах', default=0, editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False,
+    )
+
+    objects = RecipesQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'shopping_cart_count')
 
     class Meta:
         verbose_name = "рецепт"
@@ -93,14 +144,15 @@ class Recipes(models.Model):
 
     def save(self, *args, **kwargs):
         """Метод записи короткой ссылки в поле модели."""
+        super().save(*args, **kwargs)
         if not self.short_link:
             self.short_link = self.generate_short_link()
-        super().save(*args, **kwargs)
+            Recipes.objects.filter(pk=self.pk).update(
+                short_link=self.short_link)
 
     def generate_short_link(self):
-        """Генерация короткой ссылки."""
-        return str(uuid.uuid4())[:8]
-        # return str(self.name)
+        """Генерация короткой ссылки из id, без коллизий."""
+        return short_links.encode(self.pk)
 
     def __str__(self):
         return self.name[:30]
@@ -183,3 +235,100 @@ class Favorite(BaseModel):
 
     def __str__(self):
         return f'{self.user} добавил в избранное {self.recipe}'
+
+
+class ShoppingCartItem(models.Model):
+    """Суммарное количество ингредиента в корзине пользователя.
+
+    Поддерживается при изменении корзины и рецептов в ней,
+    чтобы список покупок не приходилось агрегировать заново.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+    )
+    ingredient = models.ForeignKey(Ingredients, on_delete=models.CASCADE)
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = "ингредиент в списке покупок"
+        verbose_name_plural = "список покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_ingredient_in_shopping_list'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} для {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Строки создаются при публикации рецепта (fan-out on write),
+    поэтому лента читается по индексу без соединения с подписками.
+    Автор и дата публикации копируются из рецепта.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(Recipes, on_delete=models.CASCADE)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = "запись ленты"
+        verbose_name_plural = "лента подписок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_recipe_in_feed'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class CatalogVersion(models.Model):
+    """Версия справочников тегов и ингредиентов.
+
+    Увеличивается при любом их изменении; по ней строятся ETag
+    и ключи кэша готовых ответов.
+    """
+
+    version = models.PositiveIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = "версия справочников"
+        verbose_name_plural = "версии справочников"
+
+    def __str__(self):
+        return str(self.version)
+
+    @classmethod
+    def current(cls):
+        catalog, _ = cls.objects.get_or_create(pk=1)
+        return catalog.version
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=F('version') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
@@ -0,0 +1,55 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'russian'
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vector(recipe_ids):
+    """Пересчитывает поисковый вектор: название, ингредиенты, описание."""
+    from .models import IngredientsInRecipe, Recipes
+
+    if not is_postgresql():
+        return
+    ingredient_names = IngredientsInRecipe.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    Recipes.objects.filter(pk__in=recipe_ids).update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(ingredient_names), Value('')),
+            weight='B', config=SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+def search_recipes(queryset, value):
+    """Полнотекстовый и нечёткий поиск, отсортированный по релевантности.
+
+    Вне PostgreSQL (например, в тестах на SQLite) ищет подстроку
+    в названии рецепта и ингредиентов.
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+    if not is_postgresql():
+        return queryset.filter(
+            Q(name__icontains=value) | Q(ingredients__name__icontains=value)
+        ).distinct()
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.annotate(
+        rank=(SearchRank(F('search_vector'), query)
+              + TrigramSimilarity('name', value))
+    ).filter(
+        Q(search_vector=query) | Q(name__trigram_similar=value)
+    ).order_by('-rank', '-pub_date')
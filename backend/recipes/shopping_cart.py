@@ -0,0 +1,124 @@
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .loaders import batches
+from .models import Basket, IngredientsInRecipe, ShoppingCartItem
+
+
+def recipe_amounts(recipe_ids):
+    """Суммы ингредиентов рецептов: {id ингредиента: количество}."""
+    return dict(
+        IngredientsInRecipe.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by().values('ingredient').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient', 'total')
+    )
+
+
+def apply_deltas(user_ids, deltas):
+    """Изменяет итоги списков покупок пользователей на deltas.
+
+    Число запросов не зависит ни от числа пользователей,
+    ни от числа ингредиентов. Вызывать внутри транзакции.
+    """
+    deltas = {
+        ingredient: delta for ingredient, delta in deltas.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    decreases = {
+        ingredient: delta for ingredient, delta in deltas.items() if delta < 0
+    }
+    if decreases:
+        items = ShoppingCartItem.objects.filter(
+            user__in=user_ids, ingredient__in=decreases)
+        items.update(amount=Greatest(
+            F('amount') + Case(
+                *(When(ingredient=ingredient, then=Value(delta))
+                  for ingredient, delta in decreases.items()),
+                output_field=IntegerField()
+            ),
+            Value(0)
+        ))
+        items.filter(amount=0).delete()
+    upsert([
+        (user, ingredient, delta)
+        for user in user_ids
+        for ingredient, delta in deltas.items()
+        if delta > 0
+    ])
+
+
+def upsert(rows):
+    """Прибавляет количества (пользователь, ингредиент, количество).
+
+    Отсутствующие строки вставляются, к существующим, в том числе
+    вставленным параллельной транзакцией, количество прибавляется
+    через ON CONFLICT DO UPDATE, без чтения и ошибок уникальности.
+    Синтаксис общий для PostgreSQL и SQLite 3.24+.
+    """
+    meta = ShoppingCartItem._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    fields = [
+        meta.get_field(name) for name in ('user', 'ingredient', 'amount')]
+    user, ingredient, amount = (quote(field.column) for field in fields)
+    # Пачки, как у bulk_create: на PostgreSQL одна, на SQLite в
+    # пределах ограничения на число параметров запроса.
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    with connection.cursor() as cursor:
+        for batch in batches(rows, batch_size):
+            cursor.execute(
+                f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                f'SET {amount} = {table}.{amount} + EXCLUDED.{amount}',
+                [value for row in batch for value in row]
+            )
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], {
+        ingredient: -amount
+        for ingredient, amount in recipe_amounts(recipe_ids).items()
+    })
+
+
+def change_recipe(recipe_id, deltas):
+    """Переносит изменение ингредиентов рецепта в корзины с ним."""
+    apply_deltas(
+        Basket.objects.filter(recipe=recipe_id).values_list(
+            'user', flat=True),
+        deltas
+    )
+
+
+def rebuild(user_ids=None):
+    """Пересчитывает списки покупок с нуля."""
+    items = ShoppingCartItem.objects.all()
+    # Условие на корзину — одним filter(): второй вызов добавил бы
+    # ещё одно соединение с корзинами и умножил суммы.
+    carts = Q(recipe__shopping_cart__user__isnull=False)
+    if user_ids is not None:
+        items = items.filter(user__in=user_ids)
+        carts = Q(recipe__shopping_cart__user__in=user_ids)
+    amounts = IngredientsInRecipe.objects.filter(carts)
+    items.delete()
+    totals = amounts.order_by().values(
+        'recipe__shopping_cart__user', 'ingredient'
+    ).annotate(total=Sum('amount'))
+    ShoppingCartItem.objects.bulk_create(
+        (ShoppingCartItem(
+            user_id=row['recipe__shopping_cart__user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total']
+        ) for row in totals.iterator()),
+        batch_size=1000
+    )
@@ -0,0 +1,68 @@
+import hashlib
+import hmac
+import string
+
+from django.conf import settings
+
+ALPHABET = string.digits + string.ascii_letters
+BODY_LENGTH = 7
+CHECK_LENGTH = 2
+HALF_BITS = 20
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+def _key():
+    return settings.SHORT_LINK_SECRET.encode()
+
+
+def _round(value, number):
+    digest = hmac.new(
+        _key(), f'{number}:{value}'.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], 'big') & HALF_MASK
+
+
+def _permute(value, rounds):
+    """Сеть Фейстеля: биекция на 40-битных числах, обратимая по ключу."""
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for number in rounds:
+        left, right = right, left ^ _round(right, number)
+    return (right << HALF_BITS) | left
+
+
+def _check(body):
+    digest = hmac.new(_key(), body.encode(), hashlib.sha256).digest()
+    return ''.join(
+        ALPHABET[byte % len(ALPHABET)] for byte in digest[:CHECK_LENGTH])
+
+
+def encode(recipe_id):
+    """Короткая ссылка из id: base62 от перестановки и контрольные символы.
+
+    Перестановка взаимно однозначна, поэтому ссылки не совпадают.
+    Длина отличается от старых ссылок из uuid, и их не спутать.
+    """
+    value = _permute(recipe_id, range(ROUNDS))
+    body = ''
+    for _ in range(BODY_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        body = ALPHABET[digit] + body
+    return body + _check(body)
+
+
+def decode(short_link):
+    """Id рецепта по короткой ссылке или None, если она не наша."""
+    body, check = short_link[:BODY_LENGTH], short_link[BODY_LENGTH:]
+    if (len(short_link) != BODY_LENGTH + CHECK_LENGTH
+            or any(char not in ALPHABET for char in body)
+            or not hmac.compare_digest(check, _check(body))):
+        return None
+    value = 0
+    for char in body:
+        value = value * len(ALPHABET) + ALPHABET.index(char)
+    if value >> (2 * HALF_BITS):
+        return None
+    left, right = value & HALF_MASK, value >> HALF_BITS
+    for number in reversed(range(ROUNDS)):
+        left, right = right ^ _round(left, number), left
+    return (left << HALF_BITS) | right
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User, UserSubscribers
+from . import feed, images, shopping_cart
+from .counters import change_counter
+from .models import (Basket, CatalogVersion, Favorite, Ingredients,
+                     IngredientsInRecipe, Recipes, Tag)
+from .views import link_cache
+
+
+@receiver(pre_delete, sender=Recipes)
+def remove_deleted_recipe_from_carts(sender, instance, **kwargs):
+    shopping_cart.change_recipe(instance.pk, {
+        ingredient: -amount
+        for ingredient, amount in shopping_cart.recipe_amounts(
+            [instance.pk]).items()
+    })
+
+
+@receiver(post_save, sender=Recipes)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipes)
+def publish_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        feed.publish(instance)
+
+
+@receiver(post_delete, sender=Recipes)
+def count_deleted_recipe(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1)
+
+
+@receiver(post_delete, sender=Recipes)
+def forget_deleted_recipe_link(sender, instance, **kwargs):
+    if instance.short_link:
+        transaction.on_commit(lambda: link_cache.delete(instance.short_link))
+
+
+@receiver(pre_delete, sender=User)
+def uncount_deleted_user(sender, instance, **kwargs):
+    """Снимает отметки удаляемого пользователя с чужих счётчиков."""
+    change_counter(
+        Recipes.objects.filter(
+            pk__in=Favorite.objects.filter(user=instance).values('recipe')),
+        'favorites_count', -1
+    )
+    change_counter(
+        Recipes.objects.filter(
+            pk__in=Basket.objects.filter(user=instance).values('recipe')),
+        'shopping_cart_count', -1
+    )
+    change_counter(
+        User.objects.filter(pk__in=UserSubscribers.objects.filter(
+            user=instance).values('subscriber')),
+        'subscribers_count', -1
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def bump_catalog_version(sender, **kwargs):
+    CatalogVersion.bump()
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, update_fields=None, **kwargs):
+    """Профиль автора входит в представление его рецептов."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    Recipes.objects.filter(author=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def touch_recipe_ingredients(sender, instance, **kwargs):
+    """Состав входит в представление рецепта, в том числе из админки."""
+    Recipes.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipes)
+def schedule_recipe_images(sender, instance, **kwargs):
+    if images.needs_processing(instance, 'image', images.RECIPE_VARIANTS):
+        images.process_recipe_images.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar(sender, instance, **kwargs):
+    if images.needs_processing(instance, 'avatar', images.AVATAR_VARIANTS):
+        images.process_avatar.enqueue(instance.pk)
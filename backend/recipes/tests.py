@@ -0,0 +1,145 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users.models import User, UserSubscribers
+from . import feed, shopping_cart
+from .models import (Basket, FeedEntry, Ingredients, IngredientsInRecipe,
+                     Recipes, ShoppingCartItem)
+
+
+def create_users(count, prefix='user'):
+    return [
+        User.objects.create(
+            email=f'{prefix}{number}@example.com',
+            username=f'{prefix}{number}',
+            first_name='Имя', last_name='Фамилия',
+        )
+        for number in range(count)
+    ]
+
+
+def create_recipe(author, ingredients=(), name='Рецепт'):
+    recipe = Recipes.objects.create(
+        author=author, name=name, text='Текст', cooking_time=10)
+    IngredientsInRecipe.objects.bulk_create(
+        IngredientsInRecipe(recipe=recipe, ingredient=ingredient,
+                            amount=amount)
+        for ingredient, amount in ingredients
+    )
+    return recipe
+
+
+class ShoppingCartRebuildTest(TestCase):
+
+    def setUp(self):
+        self.users = create_users(4)
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        self.recipes = [
+            create_recipe(self.users[0], [
+                (ingredient, 10 * (number + 1) + position)
+                for position, ingredient in enumerate(ingredients)
+            ])
+            for number in range(3)
+        ]
+        for user_number, user in enumerate(self.users):
+            Basket.objects.bulk_create(
+                Basket(user=user, recipe=recipe)
+                for recipe in self.recipes[:user_number + 1]
+            )
+
+    def expected(self, users):
+        totals = Counter()
+        for basket in Basket.objects.filter(user__in=users):
+            for item in basket.recipe.name_recipe.all():
+                totals[basket.user_id, item.ingredient_id] += item.amount
+        return dict(totals)
+
+    def actual(self, users):
+        return {
+            (item.user_id, item.ingredient_id): item.amount
+            for item in ShoppingCartItem.objects.filter(
+                user__in=users)
+        }
+
+    def test_rebuild_selected_users(self):
+        selected = self.users[1:]
+        shopping_cart.rebuild([user.pk for user in selected])
+        self.assertEqual(self.actual(selected), self.expected(selected))
+
+    def test_rebuild_all_users(self):
+        shopping_cart.rebuild()
+        self.assertEqual(self.actual(self.users), self.expected(self.users))
+
+
+class FanOutTest(TestCase):
+
+    def setUp(self):
+        self.author = create_users(1, 'author')[0]
+        self.followers = create_users(12, 'follower')
+        # Порядок регистрации обратен порядку id.
+        now = timezone.now()
+        for number, user in enumerate(self.followers):
+            User.objects.filter(pk=user.pk).update(
+                date_joined=now - timedelta(days=number))
+        UserSubscribers.objects.bulk_create(
+            UserSubscribers(user=user, subscriber=self.author)
+            for user in self.followers
+        )
+
+    @override_settings(FEED={**settings.FEED, 'FANOUT_BATCH_SIZE': 5})
+    def test_fan_out_reaches_every_follower_in_batches(self):
+        recipe = create_recipe(self.author)
+        FeedEntry.objects.all().delete()
+        feed.fan_out(recipe.pk)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(recipe=recipe).values_list(
+                'user', flat=True)),
+            {user.pk for user in self.followers}
+        )
+
+
+class RecipeIngredientsTouchTest(TestCase):
+
+    def setUp(self):
+        self.recipe = create_recipe(create_users(1)[0])
+        self.ingredient = Ingredients.objects.create(
+            name='соль', measurement_unit='г')
+        self.old = timezone.now() - timedelta(days=1)
+        Recipes.objects.filter(pk=self.recipe.pk).update(updated_at=self.old)
+
+    def updated_at(self):
+        return Recipes.objects.get(pk=self.recipe.pk).updated_at
+
+    def test_saved_ingredient_touches_recipe(self):
+        IngredientsInRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=5)
+        self.assertGreater(self.updated_at(), self.old)
+
+    def test_deleted_ingredient_touches_recipe(self):
+        item = IngredientsInRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=5)
+        Recipes.objects.filter(pk=self.recipe.pk).update(updated_at=self.old)
+        item.delete()
+        self.assertGreater(self.updated_at(), self.old)
+
+
+class CountersSaveTest(TestCase):
+
+    def test_save_skips_counters_and_deferred_fields(self):
+        recipe = create_recipe(create_users(1)[0])
+        loaded = Recipes.objects.defer('search_vector').get(pk=recipe.pk)
+        Recipes.objects.filter(pk=recipe.pk).update(favorites_count=3)
+        loaded.name = 'Новое название'
+        loaded.save()
+        self.assertIn('search_vector', loaded.get_deferred_fields())
+        saved = Recipes.objects.get(pk=recipe.pk)
+        self.assertEqual(saved.name, 'Новое название')
+        self.assertEqual(saved.favorites_count, 3)
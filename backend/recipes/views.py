@@ -1,10 +1,37 @@
-from django.shortcuts import get_object_or_404, redirect
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
 
+from foodgram.cache import get_cache
+from . import short_links
 from .models import Recipes
 
+link_cache = get_cache('short_link', settings.SHORT_LINK_CACHE)
+
+
+def resolve_short_link(short_link):
+    """Id рецепта по ссылке: раскодированием, из кэша или из БД."""
+    recipe_id = short_links.decode(short_link)
+    if recipe_id is not None:
+        return recipe_id
+    recipe_id = link_cache.get(short_link)
+    if recipe_id is None:
+        recipe_id = Recipes.objects.filter(
+            short_link=short_link).values_list('id', flat=True).first()
+        if recipe_id is None:
+            raise Http404
+        link_cache.set(short_link, recipe_id)
+    return recipe_id
+
 
 def redirect_to_recipe(request, short_link):
     """Метод для редиректа по короткой ссылки."""
-    recipe = get_object_or_404(Recipes, short_link=short_link)
-    recipe_url = request.build_absolute_uri(f'/recipes/{recipe.id}/')
-    return redirect(recipe_url)
+    recipe_id = resolve_short_link(short_link)
+    recipe_url = request.build_absolute_uri(f'/recipes/{recipe_id}/')
+    # Временный редирект с коротким max-age: ссылку удалённого рецепта
+    # браузеры и nginx перестанут отдавать из кэша через несколько минут.
+    response = redirect(recipe_url)
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_MAX_AGE)
+    return response
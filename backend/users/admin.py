@@ -2,15 +2,23 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.admin import ReadOnlyAdmin
 from .models import UserSubscribers
 
 user = get_user_model()
 
 
 class SpecUserAdmin(UserAdmin):
+    list_display = ('username', 'email', 'first_name', 'last_name',
+                    'recipes_count', 'subscribers_count', 'is_staff')
     search_fields = ('username', 'email')
     ordering = ('date_joined',)
 
 
+class UserSubscribersAdmin(ReadOnlyAdmin):
+    list_display = ('user', 'subscriber')
+    list_select_related = ('user', 'subscriber')
+
+
 admin.site.register(user, SpecUserAdmin)
-admin.site.register(UserSubscribers)
+admin.site.register(UserSubscribers, UserSubscribersAdmin)
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_small',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='avatars/variants/', verbose_name='Уменьшенный аватар'),
+        ),
+    ]
@@ -4,14 +4,16 @@ from django.core.validators import FileExtensionValidator
 from django.db import models
 from django.db.models import Q
 
+from recipes.counters import CountersMixin
 from .constants import MAX_LENGTH_NAME, MAX_LENGTH_EMAIL
 
 
-class User(AbstractUser):
+class User(CountersMixin, AbstractUser):
     """Кастомная модель пользователя."""
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     email = models.EmailField(max_length=MAX_LENGTH_EMAIL, unique=True)
     username = models.CharField(max_length=MAX_LENGTH_NAME,
@@ -25,6 +27,16 @@ class User(AbstractUser):
             FileExtensionValidator(allowed_extensions=('png', 'jpg', 'jpeg'))
         ],
     )
+    avatar_small = models.ImageField(
+        'Уменьшенный аватар', upload_to='avatars/variants/',
+        blank=True, null=True, editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False,
+    )
 
     class Meta:
         ordering = ('date_joined',)